@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from visualizer import get_commit_hashes, build_dependency_graph, generate_mermaid_graph, build_mermaid_pipeline
+
+# Параметры истории: количество файлов в дереве, файлов, изменяемых одним коммитом,
+# доля переименований среди изменений и период слияний побочной ветки (0 - без слияний)
+SHAPES = {
+    "linear": {"width": 100, "changes": 3, "renames": 0.0, "merge_every": 0},
+    "wide": {"width": 5000, "changes": 50, "renames": 0.0, "merge_every": 0},
+    "renames": {"width": 100, "changes": 3, "renames": 0.3, "merge_every": 0},
+    "merges": {"width": 100, "changes": 3, "renames": 0.05, "merge_every": 5},
+}
+DEFAULT_SIZES = (100, 1000)
+STAGES = ("rev_list", "changed_files", "mermaid", "pipeline")
+TAG = "bench"
+
+spawned = [0]  # Количество запущенных подпроцессов
+audit_installed = [False]
+
+
+def count_subprocesses(event, args):
+    # subprocess.run и asyncio.create_subprocess_exec оба создают subprocess.Popen
+    if event == "subprocess.Popen":
+        spawned[0] += 1
+
+
+def generate_history(shape, size, seed=0):
+    # Поток команд git fast-import: size коммитов (включая коммиты побочной ветки)
+    # и лёгкий тег TAG на последнем коммите основной ветки
+    params = SHAPES[shape]
+    generator = random.Random(seed)
+    files = [f"dir_{i % 20}/sub_{i % 7}/file_{i}.txt" for i in range(params["width"])]
+    lines = []
+    mark = 0
+    head = None
+    renamed = 0
+
+    def commit(branch, parents, changes, renames=True):
+        nonlocal mark, renamed
+        mark += 1
+        message = f"commit {mark}"
+        lines.append(f"commit refs/heads/{branch}\nmark :{mark}\n"
+                     f"committer Bench <bench@example.com> {1000000000 + mark} +0000\n"
+                     f"data {len(message)}\n{message}\n")
+        if parents:
+            lines.append(f"from :{parents[0]}\n")
+            for parent in parents[1:]:
+                lines.append(f"merge :{parent}\n")
+        for index in changes:
+            if renames and parents and generator.random() < params["renames"]:
+                renamed += 1
+                old = files[index]
+                files[index] = f"{os.path.dirname(old)}/renamed_{renamed}.txt"
+                lines.append(f"R {old} {files[index]}\n")
+            else:
+                content = f"{mark} {index}\n"
+                lines.append(f"M 644 inline {files[index]}\ndata {len(content)}\n{content}")
+        lines.append("\n")
+        return mark
+
+    # Первый коммит создаёт всё дерево, затем каждый коммит изменяет changes файлов
+    head = commit("master", [], range(len(files)))
+    while mark < size:
+        every = params["merge_every"]
+        if every and mark % every == every - 1 and mark + 2 <= size:
+            # Побочная ветка от текущей вершины и слияние с изменением одного файла. Дерево
+            # слияния берётся из основной ветки, поэтому на побочной ветке файлы не
+            # переименовываются: иначе files разошёлся бы с деревом основной ветки
+            side = commit("side", [head], generator.sample(range(len(files)), params["changes"]), False)
+            head = commit("master", [head, side], generator.sample(range(len(files)), 1))
+        else:
+            head = commit("master", [head], generator.sample(range(len(files)), params["changes"]))
+    lines.append(f"reset refs/tags/{TAG}\nfrom :{head}\n\n")
+    return "".join(lines)
+
+
+def create_repository(path, shape, size, seed=0):
+    # Пустой репозиторий в path, заполненный через git fast-import
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', path], check=True)
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=generate_history(shape, size, seed),
+                   text=True, check=True)
+    return path
+
+
+def measure(function, trace_memory):
+    # (результат, время в секундах, пиковый объём выделенной памяти в байтах или None,
+    # количество запущенных подпроцессов)
+    if trace_memory:
+        tracemalloc.start()
+    started_processes = spawned[0]
+    started = time.perf_counter()
+    try:
+        result = function()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak, spawned[0] - started_processes
+
+
+def run_stages(repo_path, directory, trace_memory):
+    # Замер стадий: последовательные get_commit_hashes, build_dependency_graph,
+    # generate_mermaid_graph и конвейер build_mermaid_pipeline целиком
+    timings = {}
+    commits, *timings["rev_list"] = measure(lambda: get_commit_hashes(repo_path, TAG), trace_memory)
+    (graph, file_nodes), *timings["changed_files"] = measure(lambda: build_dependency_graph(repo_path, commits),
+                                                             trace_memory)
+    mermaid_path = os.path.join(directory, 'graph.mmd')
+    _, *timings["mermaid"] = measure(lambda: generate_mermaid_graph(graph, file_nodes, mermaid_path), trace_memory)
+    counts, *timings["pipeline"] = measure(
+        lambda: asyncio.run(build_mermaid_pipeline(repo_path, TAG, mermaid_path)), trace_memory)
+    os.remove(mermaid_path)
+    edges = sum(len(files) for files in graph.values())
+    if counts != (len(commits), edges):
+        raise RuntimeError(f"Конвейер обработал {counts}, последовательные стадии - {(len(commits), edges)}")
+    return timings, len(commits), edges
+
+
+def benchmark(shapes, sizes, repeat=3, seed=0, trace_memory=True, keep=None):
+    # Для каждой истории: лучшее время каждой стадии из repeat запусков, количество
+    # подпроцессов стадий и пиковая память в отдельном запуске под tracemalloc.
+    # Память подпроцессов git в пиковую память не входит
+    if not audit_installed[0]:
+        sys.addaudithook(count_subprocesses)
+        audit_installed[0] = True
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for shape in shapes:
+            for size in sizes:
+                repo_path = os.path.join(keep or directory, f"{shape}_{size}")
+                started = time.perf_counter()
+                create_repository(repo_path, shape, size, seed)
+                record = {"shape": shape, "size": size, "create_seconds": time.perf_counter() - started}
+                best = dict.fromkeys(STAGES, float("inf"))
+                for _ in range(repeat):
+                    timings, record["commits"], record["edges"] = run_stages(repo_path, directory, False)
+                    for stage in STAGES:
+                        best[stage] = min(best[stage], timings[stage][0])
+                record["seconds"] = best
+                record["subprocesses"] = {stage: timings[stage][2] for stage in STAGES}
+                if trace_memory:
+                    traced, _, _ = run_stages(repo_path, directory, True)
+                    record["peak_bytes"] = {stage: traced[stage][1] for stage in STAGES}
+                records.append(record)
+                print(f"{shape:<8} {size:>7} " + " ".join(f"{stage}={best[stage]:.4f}s" for stage in STAGES),
+                      file=sys.stderr)
+    return {"python": platform.python_version(), "platform": platform.platform(), "git": git_version(),
+            "records": records}
+
+
+def git_version():
+    return subprocess.run(['git', '--version'], stdout=subprocess.PIPE, text=True, check=True).stdout.strip()
+
+
+def compare(baseline, current):
+    # Строки отношения времени стадий текущего запуска к базовому для совпадающих историй
+    previous = {(record["shape"], record["size"]): record for record in baseline["records"]}
+    lines = []
+    for record in current["records"]:
+        old = previous.get((record["shape"], record["size"]))
+        if old is None:
+            continue
+        ratios = " ".join(f"{stage}=x{record['seconds'][stage] / old['seconds'][stage]:.2f}"
+                          for stage in STAGES if old["seconds"].get(stage, 0) > 0)
+        lines.append(f"{record['shape']:<8} {record['size']:>7} {ratios}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры стадий визуализатора на синтетических Git-репозиториях")
+    parser.add_argument("-o", "--output", help="Файл результатов JSON (по умолчанию stdout)", default=None)
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=sorted(SHAPES), help="Виды историй")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Количества коммитов")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков, берётся лучшее время")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора историй")
+    parser.add_argument("--no_memory", action="store_true", help="Не замерять пиковую память")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения", default=None)
+    parser.add_argument("--keep", help="Каталог, в котором сохранить созданные репозитории", default=None)
+    args = parser.parse_args()
+
+    # Отладочный вывод visualizer.py на каждый файл исказил бы замеры
+    logging.disable(logging.CRITICAL)
+    report = benchmark(args.shapes, args.sizes, args.repeat, args.seed, not args.no_memory, args.keep)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
@@ -1,8 +1,14 @@
+import asyncio
+import os
+import sys
+import tempfile
 import unittest
 from pathlib import Path
 import subprocess
 
-from visualizer import build_dependency_graph, generate_mermaid_graph, convert_mermaid_to_png
+from visualizer import (build_dependency_graph, generate_mermaid_graph, convert_mermaid_to_png, get_commit_hashes,
+                        build_mermaid_pipeline)
+from benchmark import SHAPES, STAGES, TAG, create_repository, benchmark, compare
 
 class TestGitDependencyVisualizer(unittest.TestCase):
     def setUp(self):
@@ -70,5 +76,105 @@ class TestGitDependencyVisualizer(unittest.TestCase):
         commit_hash = self.run_git_command(['rev-list', '--max-parents=0', 'HEAD'])
         self.assertTrue(commit_hash)  # Проверка, что хэш не пустой
 
+class TestMermaidPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.test_repo = Path(self.directory.name) / 'repo'
+        self.test_repo.mkdir()
+        self.env = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+                        GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com')
+        # История с вложенным каталогом, веткой со слиянием, переименованием и пустым коммитом
+        self.git('init', '-q', '-b', 'master')
+        (self.test_repo / 'file1.txt').write_text('1')
+        (self.test_repo / 'dir').mkdir()
+        (self.test_repo / 'dir' / 'file2.txt').write_text('1')
+        self.git('add', '.')
+        self.git('commit', '-qm', 'Initial commit')
+        self.git('checkout', '-qb', 'branch')
+        (self.test_repo / 'file1.txt').write_text('2')
+        self.git('commit', '-qam', 'Branch commit')
+        self.git('checkout', '-q', 'master')
+        (self.test_repo / 'dir' / 'file2.txt').write_text('3')
+        self.git('commit', '-qam', 'Master commit')
+        self.git('merge', '-q', '--no-edit', 'branch')
+        self.git('mv', 'file1.txt', 'file3.txt')
+        self.git('commit', '-qm', 'Rename')
+        self.git('commit', '-q', '--allow-empty', '-m', 'Empty')
+        self.git('tag', 'v1')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def git(self, *args):
+        subprocess.run(['git'] + list(args), cwd=self.test_repo, env=self.env, check=True)
+
+    def test_pipeline_matches_sequential_stages(self):
+        commits = get_commit_hashes(self.test_repo, 'v1')
+        graph, file_nodes = build_dependency_graph(self.test_repo, commits)
+        expected = generate_mermaid_graph(graph, file_nodes, Path(self.directory.name) / 'expected.mmd')
+
+        mermaid_path = Path(self.directory.name) / 'graph.mmd'
+        counts = asyncio.run(build_mermaid_pipeline(self.test_repo, 'v1', mermaid_path, queue_size=1))
+        mermaid = mermaid_path.read_text()
+        self.assertEqual(counts, (len(commits), sum(len(files) for files in graph.values())))
+        self.assertEqual(mermaid.splitlines()[0], 'graph TD;')
+        self.assertEqual(sorted(mermaid.splitlines()), sorted(expected.splitlines()))
+        self.assertIn('file_dir_file2.txt', mermaid)
+        self.assertIn('file_file3.txt', mermaid)
+
+    def test_pipeline_git_failure(self):
+        # Дерево последнего коммита удалено: rev-list работает, diff-tree завершается с ошибкой
+        tree = subprocess.run(['git', 'rev-parse', 'v1^{tree}'], cwd=self.test_repo, stdout=subprocess.PIPE,
+                              text=True, check=True).stdout.strip()
+        (self.test_repo / '.git' / 'objects' / tree[:2] / tree[2:]).unlink()
+        mermaid_path = Path(self.directory.name) / 'graph.mmd'
+        with self.assertRaises(subprocess.CalledProcessError) as error:
+            asyncio.run(build_mermaid_pipeline(self.test_repo, 'v1', mermaid_path))
+        self.assertEqual(error.exception.cmd[1], 'diff-tree')
+
+        visualizer = Path(__file__).resolve().parent.parent / 'visualizer.py'
+        result = subprocess.run([sys.executable, str(visualizer), '--viz_program', sys.executable,
+                                 '--repo_path', str(self.test_repo), '--output_path', str(mermaid_path.with_suffix('.png')),
+                                 '--tag', 'v1'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('Ошибка выполнения команды Git git diff-tree', result.stdout)
+        self.assertNotIn('Тег', result.stdout)
+        self.assertFalse(mermaid_path.exists())
+
+    def test_pipeline_unknown_tag(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            asyncio.run(build_mermaid_pipeline(self.test_repo, 'missing', Path(self.directory.name) / 'graph.mmd'))
+
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            repo_path = create_repository(os.path.join(directory, 'repo'), 'merges', 20)
+            log = subprocess.run(['git', 'rev-list', '--parents', TAG], cwd=repo_path, stdout=subprocess.PIPE,
+                                 text=True, check=True).stdout.splitlines()
+            self.assertEqual(len(log), 20)
+            self.assertTrue(any(len(line.split()) == 3 for line in log))  # Есть слияния
+
+    def test_all_shapes_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for shape in SHAPES:
+                for seed in range(4):
+                    with self.subTest(shape=shape, seed=seed):
+                        repo_path = create_repository(os.path.join(directory, f'{shape}_{seed}'), shape, 300, seed)
+                        count = subprocess.run(['git', 'rev-list', '--count', TAG], cwd=repo_path,
+                                               stdout=subprocess.PIPE, text=True, check=True).stdout
+                        self.assertEqual(int(count), 300)
+
+    def test_benchmark_report(self):
+        report = benchmark(sorted(SHAPES), [12], repeat=1, trace_memory=True)
+        self.assertEqual(len(report["records"]), len(SHAPES))
+        for record in report["records"]:
+            self.assertEqual(record["commits"], 12)
+            self.assertEqual(set(record["seconds"]), set(STAGES))
+            self.assertEqual(set(record["peak_bytes"]), set(STAGES))
+            # Последовательная стадия запускает git show на каждый коммит, конвейер - два процесса
+            self.assertEqual(record["subprocesses"], {"rev_list": 1, "changed_files": 12, "mermaid": 0,
+                                                      "pipeline": 2})
+        self.assertEqual(len(compare(report, report)), len(SHAPES))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import subprocess
 import os
 import sys
@@ -10,6 +11,8 @@ import logging
 
 logging.basicConfig(level=logging.DEBUG)
 
+QUEUE_SIZE = 1024  # Максимум элементов в очереди между стадиями конвейера
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Инструмент для визуализации графа зависимостей Git-репозитория.')
     parser.add_argument('--viz_program', required=True, help='Путь к программе для визуализации графов (например, mmdc).')
@@ -94,6 +97,118 @@ def convert_mermaid_to_png(viz_program, mermaid_path, png_path):
         print("Ошибка при визуализации графа.")
         sys.exit(1)
 
+async def stream_commit_hashes(repo_path, tag, hashes):
+    # Стадия 1: хэши коммитов из git rev-list передаются дальше по мере вывода.
+    # Возвращает количество коммитов
+    args = ['rev-list', tag]
+    process = await asyncio.create_subprocess_exec('git', *args, cwd=repo_path, stdout=subprocess.PIPE,
+                                                   stderr=subprocess.PIPE)
+    count = 0
+    try:
+        async for line in process.stdout:
+            await hashes.put(line.decode().strip())
+            count += 1
+        stderr = await process.stderr.read()
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        logging.error(f"Ошибка выполнения команды Git: {stderr.decode(errors='replace')}")
+        raise subprocess.CalledProcessError(process.returncode, ['git'] + args, stderr=stderr)
+    await hashes.put(None)
+    logging.debug(f"Git command succeeded: git {' '.join(args)}")
+    return count
+
+
+async def stream_edges(repo_path, hashes, edges):
+    # Стадия 2: изменённые файлы коммитов. Один процесс git diff-tree --stdin получает хэши
+    # от стадии 1 и выводит для каждого строку "\0<хэш>" и имена файлов, как git show
+    # (--cc для слияний, -M для переименований). Рёбра (коммит, файл) передаются дальше
+    args = ['diff-tree', '--stdin', '--always', '--root', '-r', '--cc', '-M', '--name-only', '--format=%x00%H']
+    process = await asyncio.create_subprocess_exec('git', *args, cwd=repo_path, stdin=subprocess.PIPE,
+                                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    async def feed():
+        try:
+            while (commit := await hashes.get()) is not None:
+                process.stdin.write(f"{commit}\n".encode())
+                await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # git diff-tree завершился с ошибкой: она сообщается по коду возврата ниже
+            pass
+
+    async def parse():
+        count = 0
+        commit_node = None
+        seen = set()  # Узлы файлов текущего коммита: разные пути могут дать одно имя узла
+        async for line in process.stdout:
+            line = line.decode(errors='replace').rstrip('\n')
+            if line.startswith('\0'):
+                commit_node = f"commit_{line[1:]}"
+                seen.clear()
+            elif line and commit_node is not None:
+                file_node = f"file_{line.replace('/', '_')}"
+                if file_node not in seen:
+                    seen.add(file_node)
+                    await edges.put((commit_node, file_node))
+                    count += 1
+        return count
+
+    try:
+        _, count = await run_stages(feed(), parse())
+        stderr = await process.stderr.read()
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        logging.error(f"Ошибка выполнения команды Git: {stderr.decode(errors='replace')}")
+        raise subprocess.CalledProcessError(process.returncode, ['git'] + args, stderr=stderr)
+    await edges.put(None)
+    return count
+
+
+async def write_mermaid_stream(edges, output_mermaid_path):
+    # Стадия 3: строки графа Mermaid пишутся по мере поступления рёбер.
+    # Возвращает количество записанных рёбер
+    count = 0
+    with open(output_mermaid_path, 'w') as f:
+        f.write("graph TD;\n")
+        while (edge := await edges.get()) is not None:
+            f.write(f"    {edge[0]} --> {edge[1]};\n")
+            count += 1
+    return count
+
+
+async def run_stages(*coroutines):
+    # Запускает стадии одновременно; при ошибке одной из них остальные отменяются
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def build_mermaid_pipeline(repo_path, tag, output_mermaid_path, queue_size=QUEUE_SIZE):
+    # Конвейер rev-list -> diff-tree -> запись Mermaid с ограниченными очередями между стадиями:
+    # чтение git, разбор и запись идут одновременно, а память не зависит от длины истории.
+    # Возвращает (количество коммитов, количество рёбер)
+    hashes = asyncio.Queue(queue_size)
+    edges = asyncio.Queue(queue_size)
+    commits, _, written = await run_stages(stream_commit_hashes(repo_path, tag, hashes),
+                                           stream_edges(repo_path, hashes, edges),
+                                           write_mermaid_stream(edges, output_mermaid_path))
+    logging.info(f"Обработано коммитов: {commits}, записано рёбер: {written}")
+    return commits, written
+
+
 def main():
     args = parse_arguments()
 
@@ -105,18 +220,26 @@ def main():
         print(f"Репозиторий не найден по пути: {args.repo_path}")
         sys.exit(1)
 
-    commits = get_commit_hashes(args.repo_path, args.tag)
+    # Создание временного файла для Mermaid: коммиты, изменённые файлы и запись графа
+    # обрабатываются одним конвейером
+    mermaid_path = os.path.join(os.path.dirname(args.output_path), 'graph.mmd')
+    try:
+        commits, _ = asyncio.run(build_mermaid_pipeline(args.repo_path, args.tag, mermaid_path))
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(mermaid_path):
+            os.remove(mermaid_path)
+        if e.cmd[1] != 'rev-list':
+            # Ошибка получения изменённых файлов, а не отсутствие тега
+            print(f"Ошибка выполнения команды Git {' '.join(e.cmd)}:\n{e.stderr.decode(errors='replace')}")
+            sys.exit(1)
+        commits = 0
     if not commits:
+        if os.path.exists(mermaid_path):
+            os.remove(mermaid_path)
         print(f"Тег {args.tag} не найден или не содержит коммитов.")
         sys.exit(1)
 
-    graph, file_nodes = build_dependency_graph(args.repo_path, commits)
-
-    # Создание временного файла для Mermaid
-    mermaid_path = os.path.join(os.path.dirname(args.output_path), 'graph.mmd')
-    generate_mermaid_graph(graph, file_nodes, mermaid_path)
-
-    # Визуализация
+    # Визуализация: mmdc нужен весь граф, поэтому он запускается после конвейера
     convert_mermaid_to_png(args.viz_program, mermaid_path, args.output_path)
 
     # Удаление временного файла
@@ -0,0 +1,142 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from config_converter import transform_config, write_xml_file, format_error, CONVERSION_ERRORS
+from conversion_cache import ConversionCache, cache_key
+
+DEFAULT_CACHE_DIR = ".config_cache"
+STATUS_MESSAGES = {"converted": "OK", "cached": "OK (из кэша)", "unchanged": "без изменений"}
+
+
+# Сбор входных файлов: каталоги раскрываются в список файлов с расширением .txt
+def collect_inputs(paths, extension=".txt"):
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if name.endswith(extension) and os.path.isfile(full_path):
+                    inputs.append(full_path)
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def output_path_for(input_path, output_dir):
+    name = os.path.splitext(os.path.basename(input_path))[0] + ".xml"
+    return os.path.join(output_dir, name)
+
+
+# Результат преобразования одного файла. status: "converted", "cached" (XML взят
+# из кэша без разбора), "unchanged" (вход не менялся, выходной файл не перезаписан)
+ConversionResult = namedtuple("ConversionResult", ["input_path", "error", "status", "key"])
+
+
+# Преобразование одного файла. Ошибка возвращается строкой, чтобы не прерывать пакет.
+# Парсер собирается один раз при импорте config_converter в каждом процессе пула.
+def convert_file(input_path, output_path, fast=False, cache_dir=None, previous_key=None):
+    key = None
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            input_text = f.read()
+
+        cache = None
+        if cache_dir is not None:
+            key = cache_key(input_text)
+            if key == previous_key and os.path.exists(output_path):
+                return ConversionResult(input_path, None, "unchanged", key)
+            cache = ConversionCache(cache_dir)
+            if cache.get(key, output_path):
+                return ConversionResult(input_path, None, "cached", key)
+
+        config = transform_config(input_text, fast)
+        write_xml_file(config, output_path)
+        if cache is not None:
+            cache.put(key, output_path)
+    except (OSError, UnicodeDecodeError) as e:
+        return ConversionResult(input_path, f"Ошибка ввода-вывода:\n{e}", "failed", key)
+    except CONVERSION_ERRORS as e:
+        return ConversionResult(input_path, format_error(e), "failed", key)
+    return ConversionResult(input_path, None, "converted", key)
+
+
+def check_outputs(inputs, outputs):
+    # Входы с одинаковым именем из разных каталогов (a/x.txt и b/x.txt) записали бы один
+    # и тот же x.xml: процессы пула молча перезаписали бы результаты друг друга
+    sources = {}
+    collisions = []
+    for input_path, output_path in zip(inputs, outputs):
+        key = os.path.normcase(os.path.abspath(output_path))
+        if key in sources:
+            collisions.append(f"{sources[key]} и {input_path} -> {output_path}")
+        else:
+            sources[key] = input_path
+    if collisions:
+        raise ValueError("Несколько входных файлов преобразуются в один выходной:\n" + "\n".join(collisions))
+
+
+def convert_batch(inputs, output_dir, jobs=None, fast=False, cache_dir=None, changed_only=False):
+    # Возвращает список ConversionResult в порядке входных файлов.
+    # changed_only требует кэша: по манифесту пропускаются файлы, вход которых не менялся.
+    # ValueError, если два входа дают один выходной файл
+    outputs = [output_path_for(path, output_dir) for path in inputs]
+    check_outputs(inputs, outputs)
+    os.makedirs(output_dir, exist_ok=True)
+    if changed_only and cache_dir is None:
+        cache_dir = os.path.join(output_dir, DEFAULT_CACHE_DIR)
+
+    manifest = {}
+    if cache_dir is not None:
+        manifest = ConversionCache(cache_dir).load_manifest()
+    previous_keys = [manifest.get(os.path.abspath(o)) if changed_only else None for o in outputs]
+
+    if jobs == 1 or len(inputs) <= 1:
+        results = [convert_file(i, o, fast, cache_dir, k) for i, o, k in zip(inputs, outputs, previous_keys)]
+    else:
+        workers = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(inputs) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(convert_file, inputs, outputs, [fast] * len(inputs),
+                                    [cache_dir] * len(inputs), previous_keys, chunksize=chunksize))
+
+    if cache_dir is not None:
+        for output_path, result in zip(outputs, results):
+            if result.error is None:
+                manifest[os.path.abspath(output_path)] = result.key
+        ConversionCache(cache_dir).save_manifest(manifest)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное преобразование конфигураций в XML")
+    parser.add_argument("inputs", nargs="+", help="Входные файлы или каталоги с файлами .txt")
+    parser.add_argument("-o", "--output_dir", help="Каталог для выходных XML файлов", default=".")
+    parser.add_argument("-j", "--jobs", help="Количество процессов (по умолчанию по числу ядер)", type=int, default=None)
+    parser.add_argument("--fast", action="store_true", help="Использовать быстрый рукописный парсер")
+    parser.add_argument("--cache_dir", help="Каталог кэша готовых XML по хэшу входного текста", default=None)
+    parser.add_argument("--changed-only", "--changed_only", dest="changed_only", action="store_true",
+                        help=f"Перезаписывать только выходы изменившихся входов (кэш по умолчанию в <output_dir>/{DEFAULT_CACHE_DIR})")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    try:
+        results = convert_batch(inputs, args.output_dir, args.jobs, args.fast, args.cache_dir, args.changed_only)
+    except ValueError as e:
+        parser.error(str(e))
+
+    failed = 0
+    for result in results:
+        if result.error is None:
+            print(f"{result.input_path}: {STATUS_MESSAGES[result.status]}")
+        else:
+            failed += 1
+            print(f"{result.input_path}: {result.error}", file=sys.stderr)
+    print(f"Преобразовано файлов: {len(results) - failed}, с ошибками: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from config_converter import (config_parser, ConfigTransformer, FastConfigParser, XmlWriter, write_config,
+                              write_xml, pretty_print_xml)
+
+SHAPES = ("deep", "wide", "constants", "mixed")
+DEFAULT_SIZES = (100, 1000)
+PHASES = ("parse", "transform", "fast_parse", "compact_xml", "pretty_print", "write_xml")
+
+
+def generate_config(shape, size, seed=0):
+    # Синтетическая конфигурация. size - глубина вложенности для deep, количество пар
+    # для wide, количество констант для constants и количество секций для mixed
+    generator = random.Random(seed)
+    lines = ["*> Сгенерировано config_benchmark.py\n"]
+    if shape == "deep":
+        lines.append("main {\n\tvalue = " + "struct { value = " * size + str(generator.randrange(10 ** 6))
+                     + " }" * size + "\n}\n")
+    elif shape == "wide":
+        pairs = ",\n".join(f"\t\tkey_{i} = {generator.randrange(10 ** 6)}" for i in range(size))
+        lines.append(f"main {{\n\twide = struct {{\n{pairs}\n\t}}\n}}\n")
+    elif shape == "constants":
+        # Константы - числа и словари со ссылками на ранее объявленные константы. Глубина
+        # ссылок словарей ограничена, чтобы размер XML рос линейно с количеством констант
+        levels = []
+        for i in range(size):
+            shallow = [j for j in range(max(0, i - 64), i) if levels[j] < 3]
+            if shallow and generator.random() < 0.5:
+                targets = [generator.choice(shallow) for _ in range(3)]
+                refs = ", ".join(f"ref_{j} = [c_{target}]" for j, target in enumerate(targets))
+                lines.append(f"def c_{i} = struct {{ n = {i}, {refs} }}\n")
+                levels.append(1 + max(levels[target] for target in targets))
+            else:
+                lines.append(f"def c_{i} = {generator.randrange(10 ** 6)}\n")
+                levels.append(0)
+        pairs = ",\n".join(f"\tuse_{i} = [c_{generator.randrange(size)}]" for i in range(size))
+        lines.append(f"main {{\n{pairs}\n}}\n")
+    elif shape == "mixed":
+        # Секции с небольшой вложенностью, числами и ссылками на общие константы
+        lines.append("def port = 8080\n")
+        lines.append("def limits = struct { soft = 1024, hard = 4096 }\n")
+        sections = []
+        for i in range(size):
+            nested = ", ".join(f"option_{j} = {generator.randrange(1000)}" for j in range(generator.randrange(1, 6)))
+            sections.append(f"\tsection_{i} = struct {{\n\t\tport = [port],\n\t\tlimits = [limits],\n"
+                            f"\t\tnested = struct {{ {nested}, inner = struct {{ depth = 3 }} }}\n\t}}")
+        lines.append("main {\n" + ",\n".join(sections) + "\n}\n")
+    else:
+        raise ValueError(f"Неизвестный вид конфигурации: {shape}")
+    return "".join(lines)
+
+
+def write_corpus(directory, shapes, sizes, seed=0):
+    # Набор файлов .txt для batch_converter.py; возвращает список путей
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for shape in shapes:
+        for size in sizes:
+            path = os.path.join(directory, f"{shape}_{size}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(generate_config(shape, size, seed))
+            paths.append(path)
+    return paths
+
+
+def measure(function, trace_memory):
+    # (результат, время в секундах, пиковый объём выделенной памяти в байтах или None)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = function()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def compact_xml(config):
+    out = io.StringIO()
+    write_config(XmlWriter(out), config)
+    return out.getvalue()
+
+
+def run_phases(text, trace_memory):
+    # Замер фаз: разбор Lark, преобразование дерева, быстрый парсер, компактный XML,
+    # форматирование компактного XML с отступами и потоковая запись XML с отступами.
+    # Возвращает ({фаза: (время, пиковая память) или исключение}, источник дерева значений
+    # для фаз вывода XML). Ошибка фазы не прерывает остальные: фазы, которым нужен её
+    # результат, пропускаются, а вывод XML при ошибке Lark (например, переполнении стека
+    # на глубокой вложенности) замеряется на дереве быстрого парсера
+    timings = {}
+
+    def run(phase, function):
+        try:
+            result, *timings[phase] = measure(function, trace_memory)
+        except Exception as e:
+            timings[phase] = e
+            return None
+        return result
+
+    tree = run("parse", lambda: config_parser.parse(text))
+    config = run("transform", lambda: ConfigTransformer().transform(tree)) if tree is not None else None
+    fast_config = run("fast_parse", lambda: FastConfigParser(text).parse())
+    source = "lark" if config is not None else "fast"
+    if config is None:
+        config = fast_config
+    if config is None:
+        return timings, None
+    compact = run("compact_xml", lambda: compact_xml(config))
+    if compact is not None:
+        run("pretty_print", lambda: pretty_print_xml(compact))
+    run("write_xml", lambda: write_xml(config, io.StringIO()))
+    return timings, source
+
+
+def benchmark(shapes, sizes, repeat=3, seed=0, trace_memory=True):
+    # Для каждой конфигурации: лучшее время каждой фазы из repeat запусков и пиковая
+    # память в отдельном запуске под tracemalloc. Ошибки записываются по фазам в поле
+    # errors, в seconds и peak_bytes остаются только выполненные фазы
+    records = []
+    for shape in shapes:
+        for size in sizes:
+            text = generate_config(shape, size, seed)
+            record = {"shape": shape, "size": size, "bytes": len(text.encode("utf-8"))}
+            best = {}
+            errors = {}
+            for _ in range(repeat):
+                timings, record["xml_source"] = run_phases(text, False)
+                for phase, result in timings.items():
+                    if isinstance(result, Exception):
+                        errors[phase] = f"{type(result).__name__}: {result}"
+                    else:
+                        best[phase] = min(best.get(phase, float("inf")), result[0])
+            record["seconds"] = {phase: best[phase] for phase in PHASES if phase in best}
+            if trace_memory:
+                traced, _ = run_phases(text, True)
+                record["peak_bytes"] = {phase: traced[phase][1] for phase in PHASES
+                                        if phase in traced and not isinstance(traced[phase], Exception)}
+            if errors:
+                record["errors"] = errors
+            records.append(record)
+            print(f"{shape:<10} {size:>7} " + " ".join(
+                f"{phase}={record['seconds'][phase]:.4f}s" if phase in record["seconds"]
+                else f"{phase}={type_name(errors.get(phase))}" for phase in PHASES), file=sys.stderr)
+    return {"python": platform.python_version(), "platform": platform.platform(), "records": records}
+
+
+def type_name(error):
+    # Имя исключения из строки ошибки фазы или "-" для пропущенной фазы
+    return error.split(":", 1)[0] if error else "-"
+
+
+def compare(baseline, current):
+    # Строки отношения времени фаз текущего запуска к базовому для совпадающих конфигураций
+    previous = {(record["shape"], record["size"]): record for record in baseline["records"]}
+    lines = []
+    for record in current["records"]:
+        old = previous.get((record["shape"], record["size"]))
+        if old is None or "seconds" not in old:
+            continue
+        ratios = " ".join(f"{phase}=x{record['seconds'][phase] / old['seconds'][phase]:.2f}"
+                          for phase in PHASES if phase in record["seconds"] and old["seconds"].get(phase, 0) > 0)
+        lines.append(f"{record['shape']:<10} {record['size']:>7} {ratios}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация синтетических конфигураций и замеры преобразователя")
+    parser.add_argument("-o", "--output", help="Файл результатов JSON (по умолчанию stdout)", default=None)
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES), help="Виды конфигураций")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Размеры конфигураций")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков, берётся лучшее время")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+    parser.add_argument("--no_memory", action="store_true", help="Не замерять пиковую память")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения", default=None)
+    parser.add_argument("--corpus", help="Только записать конфигурации в каталог без замеров", default=None)
+    args = parser.parse_args()
+
+    if args.corpus is not None:
+        for path in write_corpus(args.corpus, args.shapes, args.sizes, args.seed):
+            print(path)
+        sys.exit(0)
+
+    report = benchmark(args.shapes, args.sizes, args.repeat, args.seed, not args.no_memory)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
@@ -1,5 +1,11 @@
+import argparse
+import io
+import os
+import re
 import sys
+import tempfile
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from lark import Lark, Transformer, exceptions, LarkError
 
 # Грамматика конфигурационного языка
@@ -27,9 +33,36 @@ NAME: /[a-zA-Z][_a-zA-Z0-9]*/
 %ignore COMMENT
 """
 
+# Версия формата выходного XML. Увеличивается при любом изменении результата
+# преобразования, чтобы сбросить кэш conversion_cache
+CONVERTER_VERSION = "1"
+
+# Строка-разделитель документов во входном потоке из нескольких конфигураций
+DEFAULT_DELIMITER = "---"
+
 # Инициализация Lark парсера
 config_parser = Lark(grammar)
 
+class ConstantPairs(list):
+    """Список пар словаря, объявленного константой.
+
+    Все ссылки [NAME] на константу получают один и тот же объект, поэтому при
+    выводе его XML строится один раз (см. write_pairs).
+    """
+
+    def __init__(self, name, pairs):
+        super().__init__(pairs)
+        self.name = name
+
+
+# Значение объявляемой константы: словарь помечается именем константы
+def constant_value(name, value):
+    typ, val = value
+    if typ == "dict" and not isinstance(val, ConstantPairs):
+        return typ, ConstantPairs(name, val)
+    return value
+
+
 class ConfigTransformer(Transformer):
     def __init__(self):
         super().__init__()
@@ -44,7 +77,7 @@ class ConfigTransformer(Transformer):
         name, value = tupl
         if name in self.constants:
             raise LarkError(f"Константа {name} уже объявлена")
-        self.constants[name] = value
+        self.constants[name] = constant_value(name, value)
 
     # Обработка вычисления константы
     def const_eval(self, value):
@@ -53,26 +86,24 @@ class ConfigTransformer(Transformer):
             raise ValueError(f"В конфигурации использована неизвестная константа по имени {name}")
         return self.constants[name]
 
-    # Обработка корневого узла
+    # Обработка корневого узла: (имя, список пар)
     def config(self, value):
-        name, info = value
-        info = info.children[0]
-        return f"<{name}>{info}</{name}>"
+        name, pairs = value
+        return name, pairs
 
-    # Обработка пары ключ-значение в словаре
+    # Обработка тела корневого узла
+    def conf(self, items):
+        return [item for item in items if item is not None]
+
+    # Обработка пары ключ-значение в словаре: (ключ, (тип, значение))
     def pair(self, value):
         key, tupl = value
-        typ, val = tupl
-        return f"<{key} type=\"{typ}\">{val}</{key}>"
+        return key, tupl
 
-    # Обработка словаря
+    # Обработка словаря. Пары не склеиваются в строку, а сохраняются списком,
+    # поэтому вложенные уровни не копируют своё поддерево
     def dict(self, items):
-        result = ""
-        # Словарь состоит из нескольких пар, каждая пара обработана через 'pair'
-        for item in items:
-            if item is not None:
-                result += item
-        return "dict", result
+        return "dict", [item for item in items if item is not None]
 
     # Обработка чисел
     def NUMBER(self, token):
@@ -86,42 +117,491 @@ class ConfigTransformer(Transformer):
     def value(self, tupl):
         return tupl[0]
 
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+ATTRIBUTE_ENTITIES = {'"': "&quot;"}
+
+
+class XmlWriter:
+    """Потоковая запись XML-событий в один выходной поток.
+
+    При indent=None пишет компактный XML без переводов строк, иначе каждый
+    элемент выводится с новой строки с отступом indent на уровень вложенности.
+    """
+
+    def __init__(self, out, indent=None, base_depth=0):
+        self.out = out
+        self.indent = indent
+        self.newline = "" if indent is None else "\n"
+        self.base_depth = base_depth  # Уровень вложенности, с которого начинается вывод
+        self.stack = []  # Имена открытых элементов
+        self.pending = False  # Открывающий тег последнего элемента ещё не закрыт символом ">"
+
+    def _flush_pending(self):
+        if self.pending:
+            self.out.write(">" + self.newline)
+            self.pending = False
+
+    @property
+    def depth(self):
+        return self.base_depth + len(self.stack)
+
+    def _write_indent(self):
+        if self.indent is not None:
+            self.out.write(self.indent * self.depth)
+
+    @staticmethod
+    def _attributes(attrib):
+        if not attrib:
+            return ""
+        return "".join(f' {name}="{escape(str(value), ATTRIBUTE_ENTITIES)}"' for name, value in attrib.items())
+
+    # Начало элемента, у которого будут дочерние элементы
+    def start(self, tag, attrib=None):
+        self._flush_pending()
+        self._write_indent()
+        self.out.write("<" + tag + self._attributes(attrib))
+        self.stack.append(tag)
+        self.pending = True
+
+    # Конец последнего открытого элемента
+    def end(self):
+        tag = self.stack.pop()
+        if self.pending:
+            self.pending = False
+            if self.indent is None:
+                self.out.write(f"></{tag}>")
+            else:
+                self.out.write("/>" + self.newline)
+            return
+        self._write_indent()
+        self.out.write(f"</{tag}>" + self.newline)
+
+    # Элемент с текстовым содержимым; при raw=True текст уже является разметкой
+    def element(self, tag, attrib, text, raw=False):
+        self._flush_pending()
+        self._write_indent()
+        if not raw:
+            text = escape(text)
+        self.out.write(f"<{tag}{self._attributes(attrib)}>{text}</{tag}>" + self.newline)
+
+    # Готовый фрагмент дочерних элементов, записанный XmlWriter на текущей глубине:
+    # строка или Fragment. В другой Fragment он добавляется ссылкой без копирования
+    def fragment(self, markup):
+        self._flush_pending()
+        if isinstance(markup, Fragment) and not isinstance(self.out, Fragment):
+            markup.write_to(self.out)
+        else:
+            self.out.write(markup)
+
+
+class Fragment(list):
+    """Разметка словаря-константы: строки и вложенные Fragment других констант.
+
+    Вложенные константы хранятся ссылками, поэтому цепочка констант, каждая из
+    которых ссылается на предыдущую, занимает память по размеру собственной
+    разметки констант, а не по размеру полного текста каждой из них.
+    """
+
+    def write(self, part):
+        self.append(part)
+
+    def write_to(self, out):
+        stack = [iter(self)]
+        while stack:
+            for part in stack[-1]:
+                if isinstance(part, Fragment):
+                    stack.append(iter(part))
+                    break
+                out.write(part)
+            else:
+                stack.pop()
+
+
+# Имя сущности DTD для словаря-константы. Префикс не даёт константам lt, gt, amp,
+# quot и apos совпасть с предопределёнными сущностями XML
+def entity_name(name):
+    return f"c_{name}"
+
+
+def write_pairs(writer, pairs, fragments=None, entities=False):
+    # Обход дерева значений с явным стеком: глубина вложенности не ограничена стеком вызовов.
+    # Словари-константы выводятся один раз на каждую глубину и далее копируются из
+    # fragments ({(имя, глубина): разметка}), а при entities=True заменяются ссылкой на сущность.
+    # Элемент стека - (итератор пар, XmlWriter, ключ fragments или None): разметка константы
+    # пишется отдельным XmlWriter во Fragment и после обхода передаётся родительскому
+    if fragments is None:
+        fragments = {}
+    stack = [(iter(pairs), writer, None)]
+    while stack:
+        items, current, fragment_key = stack[-1]
+        for key, (typ, val) in items:
+            attrib = {"type": typ}
+            if typ != "dict":
+                current.element(key, attrib, str(val))
+            elif isinstance(val, ConstantPairs) and val:
+                if entities:
+                    current.element(key, attrib, f"&{entity_name(val.name)};", raw=True)
+                    continue
+                current.start(key, attrib)
+                constant_key = (val.name, current.depth)
+                if constant_key in fragments:
+                    current.fragment(fragments[constant_key])
+                    current.end()
+                    continue
+                stack.append((iter(val), XmlWriter(Fragment(), current.indent, current.depth), constant_key))
+                break
+            else:
+                current.start(key, attrib)
+                stack.append((iter(val), current, None))
+                break
+        else:
+            stack.pop()
+            if fragment_key is not None:
+                fragments[fragment_key] = current.out
+                parent = stack[-1][1]
+                parent.fragment(fragments[fragment_key])
+                parent.end()
+            elif stack:
+                current.end()
+
+
+def write_config(writer, config, entities=False):
+    name, pairs = config
+    writer.start(name)
+    write_pairs(writer, pairs, entities=entities)
+    writer.end()
+
+
+# Словари-константы, на которые есть ссылки, в порядке зависимостей (вложенные раньше).
+# Обход с явным стеком, как в write_pairs: константа добавляется после обхода её пар
+def used_constants(pairs):
+    found = {}
+    stack = [(iter(pairs), None)]
+    while stack:
+        items, constant = stack[-1]
+        for key, (typ, val) in items:
+            if typ != "dict":
+                continue
+            if isinstance(val, ConstantPairs) and val:
+                if val.name in found:
+                    continue
+                stack.append((iter(val), val))
+            else:
+                stack.append((iter(val), None))
+            break
+        else:
+            stack.pop()
+            if constant is not None:
+                found[constant.name] = constant
+    return list(found.values())
+
+
+def write_xml_file(config, path, entities=False):
+    # write_xml в файл через временный файл в том же каталоге: при ошибке
+    # недописанный XML не остаётся на месте выходного файла
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            write_xml(config, f, entities)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def write_xml(config, out, entities=False):
+    # Запись отформатированного XML-документа прямо в выходной поток.
+    # При entities=True словари-константы объявляются сущностями во внутреннем DTD
+    out.write(XML_DECLARATION)
+    if entities:
+        name, pairs = config
+        constants = used_constants(pairs)
+        if constants:
+            out.write(f"<!DOCTYPE {name} [\n")
+            for constant in constants:
+                body = io.StringIO()
+                write_pairs(XmlWriter(body), constant, entities=True)
+                out.write(f"<!ENTITY {entity_name(constant.name)} '{body.getvalue()}'>\n")
+            out.write("]>\n")
+    write_config(XmlWriter(out, indent="\t"), config, entities)
+
+
+WS_CHARS = frozenset(" \t\f\r\n")
+SKIP_RE = re.compile(r"(?:[ \t\f\r\n]+|\*>[^\n]+)*")
+NAME_RE = re.compile(r"[a-zA-Z][_a-zA-Z0-9]*")
+NUMBER_RE = re.compile(r"[0-9]+")
+# Символы, с которых NUMBER грамматики продолжается как FLOAT
+FLOAT_CHARS = frozenset(".eE")
+
+
+class FastParseError(Exception):
+    def __init__(self, message, text, pos):
+        self.pos = pos
+        self.line = text.count("\n", 0, pos) + 1
+        self.column = pos - text.rfind("\n", 0, pos)
+        super().__init__(f"{message}, at line {self.line} col {self.column}")
+
+
+class FastConfigParser:
+    """Рекурсивный спуск по грамматике конфигурационного языка за один проход.
+
+    Константы вычисляются сразу при разборе, результат совпадает с результатом
+    ConfigTransformer. Разбирается строгое подмножество языка: на всём, что
+    парсер не принимает, бросается FastParseError, и текст передаётся эталонному
+    парсеру Lark, который и формирует итоговый результат или сообщение об ошибке.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.constants = {}
+
+    def error(self, message):
+        raise FastParseError(message, self.text, self.pos)
+
+    def skip(self):
+        self.pos = SKIP_RE.match(self.text, self.pos).end()
+
+    def startswith(self, literal):
+        return self.text.startswith(literal, self.pos)
+
+    def expect(self, literal):
+        self.skip()
+        if not self.startswith(literal):
+            self.error(f"Ожидалось {literal!r}")
+        self.pos += len(literal)
+
+    def name(self):
+        self.skip()
+        match = NAME_RE.match(self.text, self.pos)
+        if match is None:
+            self.error("Ожидалось имя")
+        self.pos = match.end()
+        return match.group()
+
+    # Разбор числа или ссылки на константу; None, если в позиции другое значение
+    def scalar(self):
+        if self.startswith("["):
+            start = self.pos
+            self.pos += 1
+            name = self.name()
+            if name not in self.constants:
+                self.pos = start
+                self.error(f"В конфигурации использована неизвестная константа по имени {name}")
+            self.expect("]")
+            return self.constants[name]
+        match = NUMBER_RE.match(self.text, self.pos)
+        if match is None:
+            return None
+        self.pos = match.end()
+        if self.text[self.pos:self.pos + 1] in FLOAT_CHARS:
+            self.error("Ожидалось целое число")
+        return "int", int(match.group())
+
+    def value(self):
+        self.skip()
+        if self.startswith("struct {"):
+            self.pos += len("struct {")
+            return "dict", self.pairs()
+        value = self.scalar()
+        if value is None:
+            self.error("Ожидалось значение")
+        return value
+
+    # Разбор "[pair ("," pair)*] }" после открывающей скобки.
+    # Вложенные struct обрабатываются явным стеком, а не рекурсией
+    def pairs(self):
+        pairs = []
+        stack = []
+        state = "open"  # open - после "{", value - после пары, comma - после ","
+        while True:
+            self.skip()
+            if state != "comma" and self.startswith("}"):
+                self.pos += 1
+                if not stack:
+                    return pairs
+                outer, key = stack.pop()
+                outer.append((key, ("dict", pairs)))
+                pairs = outer
+                state = "value"
+                continue
+            if state == "value":
+                if not self.startswith(","):
+                    self.error("Ожидалось ',' или '}'")
+                self.pos += 1
+                state = "comma"
+                continue
+
+            key = self.name()
+            self.expect("=")
+            self.skip()
+            if self.startswith("struct {"):
+                self.pos += len("struct {")
+                stack.append((pairs, key))
+                pairs = []
+                state = "open"
+                continue
+            value = self.scalar()
+            if value is None:
+                self.error("Ожидалось значение")
+            pairs.append((key, value))
+            state = "value"
+
+    def parse(self):
+        while True:
+            self.skip()
+            if not (self.startswith("def") and self.text[self.pos + 3:self.pos + 4] in WS_CHARS):
+                break
+            self.pos += len("def")
+            name = self.name()
+            self.expect("=")
+            value = self.value()
+            if name in self.constants:
+                self.error(f"Константа {name} уже объявлена")
+            self.constants[name] = constant_value(name, value)
+
+        name = self.name()
+        self.expect("{")
+        pairs = self.pairs()
+        self.skip()
+        if self.pos != len(self.text):
+            self.error("Ожидался конец входных данных")
+        return name, pairs
+
+
+# Разбор текста конфигурации в дерево значений (исключения не перехватываются).
+# При fast=True сначала используется FastConfigParser, Lark остаётся эталоном
+def transform_config(input_text, fast=False):
+    if fast:
+        try:
+            return FastConfigParser(input_text).parse()
+        except FastParseError:
+            pass  # Результат или ошибку для такого текста даёт парсер Lark
+    tree = config_parser.parse(input_text)
+    transformer = ConfigTransformer()
+    return transformer.transform(tree)
+
+
+# Ошибки разбора и преобразования одного входа: кроме ошибок Lark, рекурсивный
+# ConfigTransformer переполняет стек на глубокой вложенности словарей
+CONVERSION_ERRORS = (exceptions.LarkError, RecursionError, ValueError)
+
+
+def format_error(error):
+    if isinstance(error, exceptions.UnexpectedCharacters):
+        return f"Unexpected Characters:\n{str(error)}"
+    if isinstance(error, RecursionError):
+        return "Ошибка при обработке:\nслишком глубокая вложенность словарей"
+    return f"Ошибка при обработке:\n{str(error)}"
+
+
 # Функция для парсинга и обработки ошибок
-def parse_config(input_text):
+def parse_config(input_text, fast=False):
     try:
-        # Парсинг входного текста
-        tree = config_parser.parse(input_text)
-
-        # Преобразование дерева в XML
-        transformer = ConfigTransformer()
-        xml_output = transformer.transform(tree)
-        return xml_output
-    except exceptions.UnexpectedCharacters as uc:
-        return f"Unexpected Characters:\n{str(uc)}"
+        config = transform_config(input_text, fast)
     except exceptions.LarkError as le:
-        return f"Ошибка при обработке:\n{str(le)}"
+        return format_error(le)
+
+    # Преобразование дерева в компактный XML
+    out = io.StringIO()
+    write_config(XmlWriter(out), config)
+    return out.getvalue()
+
+
+# Документы потока из нескольких конфигураций: текст между строками-разделителями.
+# Документ отдаётся сразу после своего разделителя, так что в памяти хранится только он.
+# Пустые документы (например, перед первым разделителем) пропускаются
+def iter_documents(lines, delimiter=DEFAULT_DELIMITER):
+    document = []
+    for line in lines:
+        if line.strip() == delimiter:
+            if "".join(document).strip():
+                yield "".join(document)
+            document = []
+        else:
+            document.append(line)
+    if "".join(document).strip():
+        yield "".join(document)
+
+
+def convert_documents(documents, output, fast=False, entities=False):
+    # Если в output есть {n}, каждый документ пишется в отдельный файл output.format(n=номер),
+    # иначе все документы пишутся по мере разбора в один поток XML с несколькими корневыми
+    # элементами. Документы с ошибками пропускаются; возвращает количество ошибок
+    separate = "{n}" in output
+    if entities and not separate:
+        raise ValueError("Сущности DTD нельзя объявить в потоке из нескольких документов")
+    errors = 0
+    stream = None
+    try:
+        for number, input_text in enumerate(documents, 1):
+            try:
+                config = transform_config(input_text, fast)
+            except CONVERSION_ERRORS as e:
+                errors += 1
+                print(f"Документ {number}: {format_error(e)}")
+                continue
+            if separate:
+                write_xml_file(config, output.format(n=number), entities)
+                continue
+            if stream is None:
+                stream = open(output, 'w', encoding='utf-8')
+                stream.write(XML_DECLARATION)
+            write_config(XmlWriter(stream, indent="\t"), config)
+            stream.flush()
+    finally:
+        if stream is not None:
+            stream.close()
+    return errors
+
 
 def pretty_print_xml(xml_string):
-    # Парсинг строки XML в дерево
+    # Однократный разбор строки XML и потоковый вывод с отступами
     root = ET.fromstring(xml_string)
+    out = io.StringIO()
+    out.write(XML_DECLARATION)
+    writer = XmlWriter(out, indent="\t")
 
-    # Преобразование дерева в красиво отформатированную строку
-    pretty_xml = ET.tostring(root, encoding='UTF-8', method='xml')
+    stack = [iter([root])]
+    while stack:
+        for element in stack[-1]:
+            if len(element):
+                writer.start(element.tag, element.attrib)
+                stack.append(iter(element))
+                break
+            if element.text:
+                writer.element(element.tag, element.attrib, element.text)
+            else:
+                writer.start(element.tag, element.attrib)
+                writer.end()
+        else:
+            stack.pop()
+            if stack:
+                writer.end()
+    return out.getvalue()
 
-    # Преобразование строки в отформатированную с отступами
-    import xml.dom.minidom
-    dom = xml.dom.minidom.parseString(pretty_xml)
-
-    # Возвращаем красиво отформатированный текст
-    return f'<?xml version="1.0" encoding="utf-8"?>\n' + dom.toprettyxml(newl="\n")[23:]
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Использование: python config_converter.py <выходной_файл.xml>")
-        sys.exit(1)
-    output_filename = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Преобразование конфигурации из stdin в XML")
+    parser.add_argument("output", help="Выходной файл (.xml)")
+    parser.add_argument("--fast", action="store_true", help="Использовать быстрый рукописный парсер")
+    parser.add_argument("--entities", action="store_true", help="Выводить словари-константы ссылками на сущности DTD")
+    parser.add_argument("--multi", action="store_true",
+                        help="Несколько конфигураций в stdin, разделённых строкой --delimiter. Если в имени выходного "
+                             "файла есть {n}, каждая пишется в свой файл, иначе все - в один XML с несколькими корнями")
+    parser.add_argument("--delimiter", default=DEFAULT_DELIMITER, help="Строка-разделитель документов для --multi")
+    args = parser.parse_args()
+    if args.multi:
+        try:
+            failed = convert_documents(iter_documents(sys.stdin, args.delimiter), args.output, args.fast, args.entities)
+        except ValueError as e:
+            parser.error(str(e))
+        sys.exit(1 if failed else 0)
     input_text = sys.stdin.read()
-    xml_str = parse_config(input_text)
-    output = pretty_print_xml(xml_str)
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        f.write(output)
+    try:
+        config = transform_config(input_text, args.fast)
+        write_xml_file(config, args.output, args.entities)
+    except CONVERSION_ERRORS as e:
+        print(format_error(e))
+        sys.exit(1)
@@ -1,5 +1,12 @@
 import unittest
-from config_converter import parse_config, pretty_print_xml
+import contextlib
+import io
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from config_converter import parse_config, pretty_print_xml, transform_config, write_xml, config_parser, FastConfigParser, FastParseError, iter_documents, convert_documents, write_xml_file
+from lark import exceptions
+from batch_converter import collect_inputs, convert_batch
 
 class TestParseConfig(unittest.TestCase):
     def test_simple_config(self):
@@ -78,5 +85,251 @@ class TestPrettyPrintXML(unittest.TestCase):
                         '</main>\n')
         self.assertEqual(pretty_print_xml(parse_config(input_text)), expected_output)
 
+    def test_empty_dict(self):
+        input_text = ('main {\n'
+                      '\tempty = struct { },\n'
+                      '\tport = 80\n'
+                      '}\n')
+        expected_output = ('<?xml version="1.0" encoding="utf-8"?>\n'
+                        '<main>\n'
+                        '\t<empty type="dict"/>\n'
+                        '\t<port type="int">80</port>\n'
+                        '</main>\n')
+        self.assertEqual(parse_config(input_text), '<main><empty type="dict"></empty><port type="int">80</port></main>')
+        self.assertEqual(pretty_print_xml(parse_config(input_text)), expected_output)
+
+class TestWriteXML(unittest.TestCase):
+    def test_matches_pretty_print(self):
+        input_text = ('def inner = struct {\n'
+                      '\tx = 1\n'
+                      '}\n'
+                      'main {\n'
+                      '\ta = struct {\n'
+                      '\t\tb = struct {\n'
+                      '\t\t\tc = [inner]\n'
+                      '\t\t}\n'
+                      '\t},\n'
+                      '\td = 4\n'
+                      '}\n')
+        out = io.StringIO()
+        write_xml(transform_config(input_text), out)
+        self.assertEqual(out.getvalue(), pretty_print_xml(parse_config(input_text)))
+
+    def test_deep_nesting(self):
+        depth = 100
+        input_text = 'main { a = ' + 'struct { a = ' * depth + '1' + ' }' * depth + ' }'
+        out = io.StringIO()
+        write_xml(transform_config(input_text), out)
+        self.assertIn('\t' * (depth + 1) + '<a type="int">1</a>\n', out.getvalue())
+
+class TestConstantReuse(unittest.TestCase):
+    constant = 'struct { x = 1, inner = struct { y = 2 }, empty = struct { } }'
+
+    def test_references_match_inline_struct(self):
+        with_refs = (f'def s = {self.constant}\n'
+                     'main { a = [s], b = struct { c = [s], d = struct { e = [s] } } }')
+        inline = 'main { a = %(s)s, b = struct { c = %(s)s, d = struct { e = %(s)s } } }' % {'s': self.constant}
+        for fast in (False, True):
+            out, expected = io.StringIO(), io.StringIO()
+            write_xml(transform_config(with_refs, fast), out)
+            write_xml(transform_config(inline), expected)
+            self.assertEqual(out.getvalue(), expected.getvalue())
+        self.assertEqual(parse_config(with_refs), parse_config(inline))
+
+    def test_entities(self):
+        input_text = (f'def s = {self.constant}\n'
+                      'def t = struct { s = [s] }\n'
+                      'main { a = [t], b = [s], n = 3 }')
+        out, expected = io.StringIO(), io.StringIO()
+        write_xml(transform_config(input_text), out, entities=True)
+        write_xml(transform_config(input_text), expected)
+        self.assertEqual(out.getvalue().count('&c_s;'), 2)
+        self.assertEqual(pretty_print_xml(ET.tostring(ET.fromstring(out.getvalue().encode('utf-8')))),
+                         pretty_print_xml(ET.tostring(ET.fromstring(expected.getvalue().encode('utf-8')))))
+
+    def test_long_constant_chain(self):
+        # Каждая константа ссылается на предыдущую: вывод не зависит от стека вызовов
+        input_text = 'def c_0 = struct { v = 1 }\n'
+        input_text += ''.join(f'def c_{i} = struct {{ r = [c_{i - 1}] }}\n' for i in range(1, 2000))
+        input_text += 'main { a = [c_1999], b = struct { c = [c_1999] } }'
+        config = transform_config(input_text, fast=True)
+        for entities in (False, True):
+            out = io.StringIO()
+            write_xml(config, out, entities)
+            root = ET.fromstring(out.getvalue().encode('utf-8'))
+            self.assertEqual(len(list(root.iter('r'))), 2 * 1999)
+            self.assertEqual([v.text for v in root.iter('v')], ['1', '1'])
+
+    def test_failed_write_leaves_no_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, 'out.xml')
+            with self.assertRaises(TypeError):
+                write_xml_file(('main', [('a', ('int', 1)), ('b', ('dict', None))]), output_path)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_entities_with_predefined_names(self):
+        names = ['lt', 'gt', 'amp', 'quot', 'apos']
+        input_text = ''.join(f'def {name} = struct {{ v = {i} }}\n' for i, name in enumerate(names))
+        input_text += 'main { ' + ', '.join(f'{name} = [{name}]' for name in names) + ' }'
+        out, expected = io.StringIO(), io.StringIO()
+        write_xml(transform_config(input_text), out, entities=True)
+        write_xml(transform_config(input_text), expected)
+        self.assertEqual(pretty_print_xml(ET.tostring(ET.fromstring(out.getvalue().encode('utf-8')))),
+                         pretty_print_xml(ET.tostring(ET.fromstring(expected.getvalue().encode('utf-8')))))
+
+class TestFastParser(unittest.TestCase):
+    samples = ['Configuration of the monitoring system.txt', 'Configuring the database.txt', 'Web Application Configuration.txt']
+
+    def test_samples_match_lark(self):
+        for name in self.samples:
+            with open(os.path.join(os.path.dirname(__file__), name), encoding='utf-8') as f:
+                input_text = f.read()
+            self.assertEqual(FastConfigParser(input_text).parse(), transform_config(input_text))
+
+    def test_results_match_lark(self):
+        inputs = ['c { }',
+                  'c { a = struct { } }',
+                  '*> comment\ndef s = struct { a = 1, b = struct { } }\nc { x = [s], *> inline\n y = struct { z = [s] } }',
+                  'def x = 5\ne3 { a = [x] }',
+                  'defx = 5 c { a = [x] }',
+                  'c { a = 1.5 }',
+                  'c { a = [q] }',
+                  'def a = 1 def a = 2 c { }',
+                  'c { a = struct  { } }',
+                  'c { a = 1 ']
+        for input_text in inputs:
+            self.assertEqual(parse_config(input_text, fast=True), parse_config(input_text))
+
+    def test_error_positions_match_lark(self):
+        inputs = ['c { a = x }', 'c { a = 1 b = 2 }', 'c { a = 1, }', 'def x = 5\nc {\n\ta = struct{ }\n}', 'c { a = 1 } d']
+        for input_text in inputs:
+            with self.assertRaises(FastParseError) as fast_error:
+                FastConfigParser(input_text).parse()
+            with self.assertRaises(exceptions.UnexpectedCharacters) as lark_error:
+                config_parser.parse(input_text)
+            self.assertEqual((fast_error.exception.line, fast_error.exception.column),
+                             (lark_error.exception.line, lark_error.exception.column))
+
+class TestBatchConverter(unittest.TestCase):
+    def test_batch_reports_errors_per_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'good.txt'), 'w', encoding='utf-8') as f:
+                f.write('config {\n\tsmth = 13\n}\n')
+            with open(os.path.join(tmp, 'bad.txt'), 'w', encoding='utf-8') as f:
+                f.write('config {\n\tsmth = [x]\n}\n')
+            output_dir = os.path.join(tmp, 'out')
+
+            inputs = collect_inputs([tmp])
+            results = {r.input_path: r.error for r in convert_batch(inputs, output_dir, jobs=2)}
+
+            self.assertIsNone(results[os.path.join(tmp, 'good.txt')])
+            self.assertIn("неизвестная константа по имени x", results[os.path.join(tmp, 'bad.txt')])
+            with open(os.path.join(output_dir, 'good.xml'), encoding='utf-8') as f:
+                self.assertEqual(f.read(), pretty_print_xml(parse_config('config {\n\tsmth = 13\n}\n')))
+            self.assertFalse(os.path.exists(os.path.join(output_dir, 'bad.xml')))
+
+    def test_batch_survives_deep_nesting(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            deep = os.path.join(tmp, 'deep.txt')
+            good = os.path.join(tmp, 'good.txt')
+            with open(deep, 'w', encoding='utf-8') as f:
+                f.write('main {\n\tvalue = ' + 'struct { value = ' * 2000 + '1' + ' }' * 2000 + '\n}\n')
+            with open(good, 'w', encoding='utf-8') as f:
+                f.write('config {\n\tsmth = 13\n}\n')
+            output_dir = os.path.join(tmp, 'out')
+
+            for jobs in (1, 2):
+                results = {r.input_path: r for r in convert_batch([deep, good], output_dir, jobs=jobs)}
+                self.assertEqual(results[deep].status, 'failed')
+                self.assertIn('слишком глубокая вложенность', results[deep].error)
+                self.assertEqual(results[good].status, 'converted')
+
+    def test_batch_rejects_output_collisions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            inputs = []
+            for directory in ('a', 'b'):
+                os.makedirs(os.path.join(tmp, directory))
+                inputs.append(os.path.join(tmp, directory, 'x.txt'))
+                with open(inputs[-1], 'w', encoding='utf-8') as f:
+                    f.write('config {\n\tsmth = 13\n}\n')
+            output_dir = os.path.join(tmp, 'out')
+            with self.assertRaises(ValueError):
+                convert_batch(inputs, output_dir)
+            self.assertFalse(os.path.exists(output_dir))
+
+    def test_changed_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, 'first.txt')
+            second = os.path.join(tmp, 'second.txt')
+            for path in (first, second):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write('config {\n\tsmth = 13\n}\n')
+            output_dir = os.path.join(tmp, 'out')
+
+            statuses = [r.status for r in convert_batch([first, second], output_dir, jobs=1, changed_only=True)]
+            self.assertEqual(statuses, ['converted', 'cached'])
+
+            with open(second, 'w', encoding='utf-8') as f:
+                f.write('config {\n\tsmth = 14\n}\n')
+            statuses = [r.status for r in convert_batch([first, second], output_dir, jobs=1, changed_only=True)]
+            self.assertEqual(statuses, ['unchanged', 'converted'])
+            with open(os.path.join(output_dir, 'second.xml'), encoding='utf-8') as f:
+                self.assertIn('<smth type="int">14</smth>', f.read())
+
+class TestConfigBenchmark(unittest.TestCase):
+    def test_generated_configs(self):
+        from config_benchmark import SHAPES, generate_config, benchmark
+        for shape in SHAPES:
+            input_text = generate_config(shape, 20)
+            self.assertEqual(FastConfigParser(input_text).parse(), transform_config(input_text))
+            self.assertNotIn("Ошибка", parse_config(input_text))
+
+        report = benchmark(["wide"], [10], repeat=1)
+        self.assertEqual(set(report["records"][0]["seconds"]), set(report["records"][0]["peak_bytes"]))
+
+        # Переполнение стека в ConfigTransformer не отменяет замеры быстрого парсера и вывода XML
+        with contextlib.redirect_stderr(io.StringIO()):
+            record = benchmark(["deep"], [1000], repeat=1, trace_memory=False)["records"][0]
+        self.assertEqual(list(record["errors"]), ["transform"])
+        self.assertEqual(record["xml_source"], "fast")
+        self.assertEqual(set(record["seconds"]), {"parse", "fast_parse", "compact_xml", "pretty_print", "write_xml"})
+
+class TestMultiDocument(unittest.TestCase):
+    stream = ('def x = 5\na { b = [x] }\n---\n---\n'
+              'c { d = struct { e = 1 } }\n---\nbad { q = [nope] }\n---\nz { }\n')
+
+    def test_iter_documents(self):
+        documents = iter_documents(io.StringIO(self.stream))
+        self.assertEqual(next(documents), 'def x = 5\na { b = [x] }\n')
+        self.assertEqual(list(documents), ['c { d = struct { e = 1 } }\n', 'bad { q = [nope] }\n', 'z { }\n'])
+
+    def test_convert_documents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stream_path = os.path.join(tmp, 'all.xml')
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                errors = convert_documents(iter_documents(io.StringIO(self.stream)), stream_path)
+            self.assertEqual(errors, 1)
+            self.assertIn("Документ 3:", printed.getvalue())
+            with open(stream_path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), '<?xml version="1.0" encoding="utf-8"?>\n<a>\n\t<b type="int">5</b>\n</a>\n'
+                                           '<c>\n\t<d type="dict">\n\t\t<e type="int">1</e>\n\t</d>\n</c>\n<z/>\n')
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert_documents(iter_documents(io.StringIO(self.stream)), os.path.join(tmp, 'doc_{n}.xml'))
+            self.assertEqual(sorted(os.listdir(tmp)), ['all.xml', 'doc_1.xml', 'doc_2.xml', 'doc_4.xml'])
+            with open(os.path.join(tmp, 'doc_4.xml'), encoding='utf-8') as f:
+                self.assertEqual(f.read(), pretty_print_xml(parse_config('z { }')))
+
+    def test_deep_document_does_not_stop_stream(self):
+        deep = 'main { value = ' + 'struct { value = ' * 2000 + '1' + ' }' * 2000 + ' }\n'
+        with tempfile.TemporaryDirectory() as tmp:
+            stream_path = os.path.join(tmp, 'all.xml')
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                errors = convert_documents(iter_documents(io.StringIO(deep + '---\nz { }\n')), stream_path)
+            self.assertEqual(errors, 1)
+            self.assertIn("Документ 1:", printed.getvalue())
+            with open(stream_path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), '<?xml version="1.0" encoding="utf-8"?>\n<z/>\n')
+
 if __name__ == '__main__':
     unittest.main()
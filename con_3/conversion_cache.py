@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from config_converter import grammar, CONVERTER_VERSION
+
+MANIFEST_NAME = "manifest.json"
+
+# Хэш версии преобразователя и грамматики считается один раз при импорте
+_VERSION_DIGEST = hashlib.sha256(f"{CONVERTER_VERSION}\0{grammar}".encode("utf-8")).digest()
+
+
+# Ключ кэша: хэш входного текста вместе с версией преобразователя и грамматики
+def cache_key(input_text):
+    digest = hashlib.sha256(_VERSION_DIGEST)
+    digest.update(input_text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """Каталог с готовыми XML, сохранёнными по ключу cache_key.
+
+    Кроме XML в каталоге хранится манифест: для каждого выходного файла
+    ключ входных данных, из которых он был получен в последний раз.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + ".xml")
+
+    # Копирует сохранённый XML в output_path; False, если ключа нет в кэше
+    def get(self, key, output_path):
+        try:
+            shutil.copyfile(self.path(key), output_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, output_path):
+        with open(output_path, 'rb') as source:
+            self._replace(self.path(key), lambda f: shutil.copyfileobj(source, f))
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self, manifest):
+        data = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+        self._replace(os.path.join(self.cache_dir, MANIFEST_NAME), lambda f: f.write(data))
+
+    # Атомарная запись: параллельные процессы пула не видят недописанных файлов
+    def _replace(self, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
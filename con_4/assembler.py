@@ -1,6 +1,132 @@
 import argparse
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+WORD_SIZE = 6  # Размер одной команды в байтах
+MIN_CHUNK_SIZE = 1 << 20  # Минимальный размер части исходного файла при параллельном кодировании
+
+# Поле команды: имя, смещение в битах, ширина в битах и начало сообщения об ошибке диапазона
+Field = namedtuple("Field", ["name", "offset", "width", "subject"])
+# Описание команды: код операции A, поля после A и название операции для сообщений об ошибках
+CommandSpec = namedtuple("CommandSpec", ["opcode", "fields", "title"])
+
+ADDRESS_B = Field("B", 7, 7, "Адрес B должен")
+
+COMMANDS = {
+    "LOAD_CONSTANT": CommandSpec(36, (ADDRESS_B, Field("C", 14, 28, "Константа C должна")), "загрузки константы"),
+    "READ_MEMORY": CommandSpec(58, (ADDRESS_B, Field("C", 14, 13, "Адрес C должен")), "чтении из памяти"),
+    "WRITE_MEMORY": CommandSpec(25, (ADDRESS_B, Field("C", 14, 13, "Адрес C должен")), "чтении из памяти"),
+    "MUL": CommandSpec(32, (ADDRESS_B, Field("C", 14, 7, "Адрес C должен"), Field("D", 21, 7, "Адрес D должен")),
+                       "умножения"),
+}
+
+
+def encode(spec, args):
+    # Кодирует команду с аргументами A, B, C[, D] в целое число по таблице COMMANDS
+    if args[0] != spec.opcode:
+        raise ValueError(f"Параметр А должен быть равен {spec.opcode}")
+    word = spec.opcode
+    for value, field in zip(args[1:], spec.fields):
+        if not (0 <= value < (1 << field.width)):
+            raise ValueError(f"{field.subject} быть в пределах от 0 до 2^{field.width}-1")
+        word |= value << field.offset
+    return word
+
+
+def parse_line(line):
+    # Разбирает строку исходного кода: None для пустой строки, иначе (команда, описание, аргументы)
+    line = line.split('\n')[0].strip()
+    if not line:
+        return None
+
+    command, *args = line.split()
+    spec = COMMANDS.get(command)
+    if spec is None:
+        raise SyntaxError(f"{line}\nНеизвестная команда")
+    if len(args) != len(spec.fields) + 1:
+        raise SyntaxError(f"{line}\nУ операции {spec.title} должно быть {len(spec.fields) + 1} аргумента")
+    return command, spec, [int(arg) for arg in args]
+
+
+def log_line(command, spec, args, bits):
+    names = ("A",) + tuple(field.name for field in spec.fields)
+    attributes = " ".join(f'{name}="{value}"' for name, value in zip(names, args))
+    return f"\t<{command} {attributes}>{bits.hex()}</{command}>\n"
+
+
+def split_chunks(path, chunk_size):
+    # Границы частей файла, выровненные по началу строки
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as source:
+        position = chunk_size
+        while position < size:
+            source.seek(position)
+            source.readline()
+            position = source.tell()
+            if position >= size:
+                break
+            bounds.append(position)
+            position += chunk_size
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def read_chunk(path, start, end):
+    with open(path, "rb") as source:
+        source.seek(start)
+        return source.read(end - start).decode().split("\n")
+
+
+def count_chunk(path, start, end):
+    # Первый проход: количество строк и непустых строк (команд) в части файла
+    lines = read_chunk(path, start, end)
+    if lines[-1] == "":
+        lines.pop()
+    return len(lines), sum(1 for line in lines if line.strip())
+
+
+def encode_chunk(path, start, end, output_path, offset, first_line, with_log):
+    # Второй проход: кодирует часть файла и пишет её в выходной файл по смещению offset.
+    # Возвращает (текст лога или None, ошибка или None); ошибка - (номер строки, тип, сообщение)
+    code = bytearray()
+    log_lines = [] if with_log else None
+    for line_number, line in enumerate(read_chunk(path, start, end), first_line):
+        try:
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            command, spec, args = parsed
+            bits = encode(spec, args).to_bytes(WORD_SIZE, byteorder="little")
+        except (SyntaxError, ValueError) as e:
+            return None, (line_number, type(e), str(e))
+        code += bits
+        if log_lines is not None:
+            log_lines.append(log_line(command, spec, args, bits))
+
+    with open(output_path, "r+b") as binary:
+        binary.seek(offset)
+        binary.write(code)
+    return ("".join(log_lines) if log_lines is not None else None), None
+
+
+class WordView:
+    """Доступ к закодированным командам буфера как к отдельным 6-байтовым значениям."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer) // WORD_SIZE
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not (0 <= index < len(self)):
+            raise IndexError("Номер команды вне диапазона")
+        return bytes(self.buffer[index * WORD_SIZE:(index + 1) * WORD_SIZE])
+
 
 class Assembler:
     def __init__(self, path_to_code, path_to_binary_file, path_to_log):
@@ -8,145 +134,93 @@ class Assembler:
         self.code_path = path_to_code
         self.log_path = path_to_log
 
-        self.bytes = []
-        self.log_root = ET.Element("log")
-
-    def load_constant(self, A, B, C):
-        #Кодирует команду LOAD_CONSTANT в байты
-        if (A != 36):
-            raise ValueError("Параметр А должен быть равен 36")
-        if not (0 <= B < (1 << 7)):
-            raise ValueError("Адрес B должен быть в пределах от 0 до 2^7-1")
-        if not (0 <= C < (1 << 28)):
-            raise ValueError("Константа C должна быть в пределах от 0 до 2^28-1")
-
-        bits = (C << 14) | (B << 7) | A
-        bits = bits.to_bytes(6, byteorder="little")
-
-        element = ET.SubElement(self.log_root, 'LOAD_CONSTANT')
-        element.attrib['A'] = str(A)
-        element.attrib['B'] = str(B)
-        element.attrib['C'] = str(C)
-        element.text = bits.hex()
-
-        return bits
-
-    def read_memory(self, A, B, C):
-        #Кодирует команду READ_MEMORY в байты
-        if (A != 58):
-            raise ValueError("Параметр А должен быть равен 58")
-        if not (0 <= B < (1 << 7)):
-            raise ValueError("Адрес B должен быть в пределах от 0 до 2^7-1")
-        if not (0 <= C < (1 << 13)):
-            raise ValueError("Адрес C должен быть в пределах от 0 до 2^13-1")
-
-        bits = (C << 14) | (B << 7) | A
-        bits = bits.to_bytes(6, byteorder="little")
-
-        element = ET.SubElement(self.log_root, 'READ_MEMORY')
-        element.attrib['A'] = str(A)
-        element.attrib['B'] = str(B)
-        element.attrib['C'] = str(C)
-        element.text = bits.hex()
-
-        return bits
-
-    def write_memory(self, A, B, C):
-        #Кодирует команду WRITE_MEMORY в байты
-        if (A != 25):
-            raise ValueError("Параметр А должен быть равен 25")
-        if not (0 <= B < (1 << 7)):
-            raise ValueError("Адрес B должен быть в пределах от 0 до 2^7-1")
-        if not (0 <= C < (1 << 13)):
-            raise ValueError("Адрес C должен быть в пределах от 0 до 2^13-1")
-
-        bits = (C << 14) | (B << 7) | A
-        bits = bits.to_bytes(6, byteorder="little")
-
-        element = ET.SubElement(self.log_root, 'WRITE_MEMORY')
-        element.attrib['A'] = str(A)
-        element.attrib['B'] = str(B)
-        element.attrib['C'] = str(C)
-        element.text = bits.hex()
-
-        return bits
-
-    def multiply(self, A, B, C, D):
-        #Кодирует команду MUL в байты
-        if (A != 32):
-            raise ValueError("Параметр А должен быть равен 32")
-        if not (0 <= B < (1 << 7)):
-            raise ValueError("Адрес B должен быть в пределах от 0 до 2^7-1")
-        if not (0 <= C < (1 << 7)):
-            raise ValueError("Адрес C должен быть в пределах от 0 до 2^7-1")
-        if not (0 <= D < (1 << 7)):
-            raise ValueError("Адрес D должен быть в пределах от 0 до 2^7-1")
-
-        bits = (D << 21) | (C << 14) | (B << 7) | A
-        bits = bits.to_bytes(6, byteorder="little")
-
-        element = ET.SubElement(self.log_root, 'MUL')
-        element.attrib['A'] = str(A)
-        element.attrib['B'] = str(B)
-        element.attrib['C'] = str(C)
-        element.attrib['D'] = str(D)
-        element.text = bits.hex()
-
-        return bits
-
-    def assemble(self):
-        #Считывает входной файл с кодом и обрабатывает команды в байты
-        with open(self.code_path, "rt") as code:
-            for line in code:
-                line = line.split('\n')[0].strip()
-                if not line: continue
-
-                command, *args = line.split()
-
-                match command:
-                    case "LOAD_CONSTANT":
-                        if len(args) != 3:
-                            raise SyntaxError(
-                                f"{line}\nУ операции загрузки константы должно быть 3 аргумента")
-
-                        self.bytes.append(self.load_constant(int(args[0]), int(args[1]), int(args[2])))
-
-                    case "READ_MEMORY":
-                        if len(args) != 3:
-                            raise SyntaxError(
-                                f"{line}\nУ операции чтении из памяти должно быть 3 аргумента")
-
-                        self.bytes.append(self.read_memory(int(args[0]), int(args[1]), int(args[2])))
-
-                    case "WRITE_MEMORY":
-                        if len(args) != 3:
-                            raise SyntaxError(
-                                f"{line}\nУ операции чтении из памяти должно быть 3 аргумента")
-
-                        self.bytes.append(self.write_memory(int(args[0]), int(args[1]), int(args[2])))
-
-                    case "MUL":
-                        if len(args) != 4:
-                            raise SyntaxError(
-                                f"{line}\nУ операции умножения должно быть 4 аргумента")
-
-                        self.bytes.append(self.multiply(int(args[0]), int(args[1]), int(args[2]), int(args[3])))
-
-                    case _:
-                        raise SyntaxError(f"{line}\nНеизвестная команда")
+        self.code = bytearray()
+        self.log_lines = [] if path_to_log is not None else None
+
+    @property
+    def bytes(self):
+        return WordView(self.code)
+
+    def assemble(self, jobs=1, chunk_size=None):
+        #Считывает входной файл с кодом и кодирует команды в общий буфер.
+        #При jobs != 1 большие файлы кодируются частями в пуле процессов
+        if jobs != 1:
+            workers = jobs or os.cpu_count() or 1
+            if chunk_size is None:
+                chunk_size = max(MIN_CHUNK_SIZE, os.path.getsize(self.code_path) // (4 * workers))
+            chunks = split_chunks(self.code_path, chunk_size)
+            if len(chunks) > 1:
+                self.assemble_parallel(chunks, workers)
+                return
+
+        code = self.code
+        log_lines = self.log_lines
+        with open(self.code_path, "rt") as source:
+            for line_number, line in enumerate(source, 1):
+                try:
+                    parsed = parse_line(line)
+                    if parsed is None:
+                        continue
+                    command, spec, args = parsed
+                    bits = encode(spec, args).to_bytes(WORD_SIZE, byteorder="little")
+                except (SyntaxError, ValueError) as e:
+                    # Сообщение с номером строки, как при кодировании частями
+                    raise type(e)(f"Строка {line_number}: {e}") from e
+                code += bits
+
+                # Запись лога формируется только если он был запрошен
+                if log_lines is not None:
+                    log_lines.append(log_line(command, spec, args, bits))
 
         self.to_binary_file()
-
-        log_data = ET.tostring(self.log_root, encoding="unicode", method="xml").encode()
-        dom = xml.dom.minidom.parseString(log_data)
-        log = f'<?xml version="1.0" encoding="utf-8"?>\n' + dom.toprettyxml(newl="\n")[23:]
-        with open(self.log_path, 'w', encoding='utf-8') as f:
-            f.write(log)
+        if log_lines is not None:
+            self.to_log_file()
+
+    def assemble_parallel(self, chunks, workers):
+        # Результат пишется сразу в выходной файл, буфер self.code остаётся пустым
+        paths = [self.code_path] * len(chunks)
+        starts = [start for start, _ in chunks]
+        ends = [end for _, end in chunks]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(count_chunk, paths, starts, ends))
+
+            # Смещение каждой части в выходном файле и номер её первой строки
+            offsets, first_lines = [], []
+            offset, line = 0, 1
+            for line_count, command_count in counts:
+                offsets.append(offset)
+                first_lines.append(line)
+                offset += command_count * WORD_SIZE
+                line += line_count
+
+            with open(self.binary_file_path, "wb") as binary:
+                binary.truncate(offset)
+            results = list(pool.map(encode_chunk, paths, starts, ends, [self.binary_file_path] * len(chunks),
+                                    offsets, first_lines, [self.log_lines is not None] * len(chunks)))
+
+        errors = [error for _, error in results if error is not None]
+        if errors:
+            os.remove(self.binary_file_path)
+            line_number, error_type, message = min(errors, key=lambda error: error[0])
+            raise error_type(f"Строка {line_number}: {message}")
+
+        if self.log_lines is not None:
+            self.log_lines = [log for log, _ in results]
+            self.to_log_file()
 
     def to_binary_file(self):
         with open(self.binary_file_path, "wb") as binary:
-            for byte in self.bytes:
-                binary.write(byte)
+            binary.write(self.code)
+
+    def to_log_file(self):
+        with open(self.log_path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            if not self.log_lines:
+                f.write("<log/>\n")
+                return
+            f.write("<log>\n")
+            f.writelines(self.log_lines)
+            f.write("</log>\n")
 
 
 if __name__ == "__main__":
@@ -154,11 +228,13 @@ if __name__ == "__main__":
     parser.add_argument("input", help="Входной файл (.asm)")
     parser.add_argument("output", help="Выходной файл (.bin)")
     parser.add_argument("-l", "--log", help="Файл лога (.xml)", default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Количество процессов для кодирования больших файлов частями (0 - по числу ядер)")
     args = parser.parse_args()
 
     assembler = Assembler(args.input, args.output, args.log)
     try:
-        assembler.assemble()
+        assembler.assemble(args.jobs)
     except ValueError as e:
         print(e)
     print(f"Ассемблирование выполнено успешно. Выходной файл: {args.output}")
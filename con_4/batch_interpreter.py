@@ -0,0 +1,103 @@
+import argparse
+import csv
+
+import numpy as np
+
+from interpreter import Program
+from numpy_backend import run_batch
+
+
+def load_memories(path, width, allow_pickle=False):
+    # Матрица начальных состояний памяти из .npy или .csv (строка - один набор).
+    # Недостающие справа ячейки заполняются нулями. Матрицы dtype=object (значения вне
+    # int64) хранятся в .npy через pickle, загрузка которого может исполнить произвольный
+    # код, поэтому они читаются только при allow_pickle=True
+    if path.endswith(".csv"):
+        memories = np.loadtxt(path, delimiter=",", dtype=np.int64, ndmin=2)
+    else:
+        try:
+            memories = np.load(path, allow_pickle=allow_pickle)
+        except ValueError:
+            if allow_pickle:
+                raise
+            raise ValueError("Матрица памяти с dtype=object загружается только с флагом --allow_pickle")
+        if memories.ndim == 1:
+            memories = memories.reshape(1, -1)
+    if memories.ndim != 2 or memories.shape[1] > width:
+        raise ValueError(f"Матрица памяти должна быть двумерной и содержать не более {width} столбцов")
+    if memories.shape[1] < width:
+        memories = np.pad(memories, ((0, 0), (0, width - memories.shape[1])))
+    return memories
+
+
+def pack_wide(values):
+    # Матрица int Python в байтах фиксированной ширины, как в results.write_binary: значения
+    # знаковые little-endian, ширина 8 байт или больше, последняя ось - байты значения
+    bits = max((int(value).bit_length() for value in values.flat), default=0) + 1
+    width = max(8, -(-bits // 8))
+    data = b"".join(int(value).to_bytes(width, byteorder="little", signed=True) for value in values.flat)
+    return np.frombuffer(data, dtype=np.uint8).reshape(values.shape + (width,))
+
+
+def unpack_wide(data):
+    values = [int.from_bytes(value.tobytes(), byteorder="little", signed=True)
+              for value in data.reshape(-1, data.shape[-1])]
+    return np.array(values, dtype=object).reshape(data.shape[:-1])
+
+
+def save_results(path, results, left_boundary):
+    # Столбцовый вывод: только ячейки, ненулевые хотя бы в одной строке, как в make_result.
+    # .npz содержит массивы addresses и values, в .csv первая строка - адреса.
+    # Матрица dtype=object (промежуточные значения не поместились в int64) сохраняется
+    # как int64, если в него помещаются итоговые значения, иначе в .npz вместо values
+    # пишется wide_values (pack_wide): массивы dtype=object сохраняются только через pickle
+    columns = np.flatnonzero(np.any(results != 0, axis=0))
+    addresses = columns + left_boundary
+    values = results[:, columns]
+    if path.endswith(".csv"):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(addresses.tolist())
+            writer.writerows(values.tolist())
+        return
+    if values.dtype == object:
+        try:
+            values = values.astype(np.int64)
+        except OverflowError:
+            np.savez(path, addresses=addresses, wide_values=pack_wide(values))
+            return
+    np.savez(path, addresses=addresses, values=values)
+
+
+def load_results(path):
+    # Обратное чтение .npz: (адреса, матрица значений; dtype=object для wide_values)
+    with np.load(path) as data:
+        if "wide_values" in data:
+            return data["addresses"], unpack_wide(data["wide_values"])
+        return data["addresses"], data["values"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Исполнение одной программы над множеством начальных состояний памяти")
+    parser.add_argument("input", help="Входной бинарный файл")
+    parser.add_argument("memories", help="Матрица начальных состояний памяти (.npy или .csv)")
+    parser.add_argument("output", help="Выходной файл (.npz или .csv)")
+    parser.add_argument("-lb", "--left_boundary", help="Левая граница памяти", default=0)
+    parser.add_argument("-rb", "--right_boundary", help="Правая граница памяти", default=8191)
+    parser.add_argument("--cache", action="store_true", help="Кэшировать предекодированную программу рядом с бинарным файлом")
+    parser.add_argument("--allow_pickle", action="store_true",
+                        help="Разрешить .npy с dtype=object (значения вне int64). Загрузка pickle может исполнить "
+                             "произвольный код: только для файлов из доверенного источника")
+    args = parser.parse_args()
+
+    left_boundary, right_boundary = int(args.left_boundary), int(args.right_boundary)
+    try:
+        program = Program.from_file(args.input, args.cache)
+        program.validate(left_boundary, right_boundary)
+        memories = load_memories(args.memories, right_boundary - left_boundary + 1, args.allow_pickle)
+        results = run_batch(program, memories, left_boundary)
+    except ValueError as e:
+        print(e)
+    else:
+        save_results(args.output, results, left_boundary)
+        print(f"Интерпретация выполнена для {len(results)} наборов памяти. Результаты сохранены в {args.output}")
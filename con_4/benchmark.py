@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from assembler import Assembler
+from interpreter import Interpreter
+from results import RESULT_FORMATS
+
+# Доли команд LOAD_CONSTANT, READ_MEMORY, WRITE_MEMORY, MUL в каждом наборе
+MIXES = {
+    "constants": (0.7, 0.1, 0.1, 0.1),
+    "copies": (0.1, 0.45, 0.45, 0.0),
+    "mul_tree": (0.2, 0.0, 0.0, 0.8),
+    "wide": (0.25, 0.35, 0.35, 0.05),
+}
+DEFAULT_SIZES = (1000, 10000, 100000)
+PHASES = ("assemble", "decode", "run", "dump")
+
+
+def generate_source(path, size, mix, right_boundary, seed=0):
+    # Программа из size команд. Адреса берутся из начала памяти, в наборе wide адреса
+    # READ_MEMORY и WRITE_MEMORY разбросаны по всему диапазону [0, right_boundary]
+    generator = random.Random(seed)
+    short_limit = min(right_boundary + 1, 1 << 7)
+    wide_limit = min(right_boundary + 1, 1 << 13)
+    address_limit = wide_limit if mix == "wide" else short_limit
+    half = max(1, short_limit // 2)
+    weights = MIXES[mix]
+    with open(path, "w") as source:
+        previous = half
+        for command in generator.choices(range(4), weights, k=size):
+            b = generator.randrange(short_limit)
+            if command == 0:
+                source.write(f"LOAD_CONSTANT 36 {b} {generator.randrange(1 << 28)}\n")
+            elif command == 1:
+                source.write(f"READ_MEMORY 58 {b} {generator.randrange(address_limit)}\n")
+            elif command == 2:
+                source.write(f"WRITE_MEMORY 25 {b} {generator.randrange(address_limit)}\n")
+            else:
+                # Результат пишется в верхнюю половину коротких адресов, множитель D берётся из
+                # нижней; C с вероятностью 1/2 - предыдущий результат, так цепочки остаются короткими
+                b = half + generator.randrange(short_limit - half)
+                c = previous if generator.random() < 0.5 else generator.randrange(half)
+                source.write(f"MUL 32 {b} {c} {generator.randrange(half)}\n")
+                previous = b
+
+
+def measure(function, trace_memory):
+    # (время в секундах, пиковый объём выделенной памяти в байтах или None)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        function()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_phases(directory, size, mix, right_boundary, backend, result_format, trace_memory, seed):
+    # Замер фаз ассемблирования, декодирования, исполнения и записи результата
+    source = os.path.join(directory, f"{mix}_{size}.asm")
+    binary = os.path.join(directory, f"{mix}_{size}.bin")
+    result = os.path.join(directory, f"{mix}_{size}.result")
+    if not os.path.exists(source):
+        generate_source(source, size, mix, right_boundary, seed)
+
+    timings = {}
+    timings["assemble"] = measure(lambda: Assembler(source, binary, None).assemble(), trace_memory)
+    interpreters = []
+    timings["decode"] = measure(lambda: interpreters.append(
+        Interpreter(binary, 0, right_boundary, result, backend=backend, result_format=result_format)), trace_memory)
+    interpreter = interpreters[0]
+    interpreter.program.validate(*interpreter.boundaries)
+    timings["run"] = measure(interpreter.run, trace_memory)
+    timings["dump"] = measure(interpreter.make_result, trace_memory)
+    return timings
+
+
+def benchmark(sizes, mixes, boundaries, backends=("python",), result_format="xml", repeat=3, seed=0,
+              trace_memory=True):
+    # Для каждого сочетания параметров: лучшее время каждой фазы из repeat запусков
+    # и пиковая память в отдельном запуске под tracemalloc (он сильно замедляет compile())
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for right_boundary in boundaries:
+            for mix in mixes:
+                for size in sizes:
+                    for backend in backends:
+                        best = dict.fromkeys(PHASES, float("inf"))
+                        for _ in range(repeat):
+                            timings = run_phases(directory, size, mix, right_boundary, backend, result_format,
+                                                 False, seed)
+                            for phase in PHASES:
+                                best[phase] = min(best[phase], timings[phase][0])
+                        record = {"mix": mix, "size": size, "right_boundary": right_boundary, "backend": backend,
+                                  "seconds": best}
+                        if trace_memory:
+                            traced = run_phases(directory, size, mix, right_boundary, backend, result_format, True,
+                                                seed)
+                            record["peak_bytes"] = {phase: traced[phase][1] for phase in PHASES}
+                        records.append(record)
+                        print(f"{mix:<10} {size:>9} rb={right_boundary:<6} {backend:<8} "
+                              + " ".join(f"{phase}={best[phase]:.4f}s" for phase in PHASES), file=sys.stderr)
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "result_format": result_format,
+        "records": records,
+    }
+
+
+def record_key(record):
+    return record["mix"], record["size"], record["right_boundary"], record["backend"]
+
+
+def compare(baseline, current):
+    # Строки отношения времени фаз текущего запуска к базовому для совпадающих параметров
+    previous = {record_key(record): record for record in baseline["records"]}
+    lines = []
+    for record in current["records"]:
+        old = previous.get(record_key(record))
+        if old is None:
+            continue
+        ratios = " ".join(f"{phase}=x{record['seconds'][phase] / old['seconds'][phase]:.2f}"
+                          for phase in PHASES if old["seconds"][phase] > 0)
+        mix, size, right_boundary, backend = record_key(record)
+        lines.append(f"{mix:<10} {size:>9} rb={right_boundary:<6} {backend:<8} {ratios}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры ассемблера и интерпретатора на сгенерированных программах")
+    parser.add_argument("-o", "--output", help="Файл результатов JSON (по умолчанию stdout)", default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Количества команд")
+    parser.add_argument("--mixes", nargs="+", choices=sorted(MIXES), default=sorted(MIXES), help="Наборы команд")
+    parser.add_argument("--boundaries", type=int, nargs="+", default=[8191],
+                        help="Правые границы памяти (левая граница 0)")
+    parser.add_argument("--backends", nargs="+", choices=["python", "numpy", "compiled"], default=["python"],
+                        help="Способы исполнения")
+    parser.add_argument("-f", "--format", choices=RESULT_FORMATS, default="xml", help="Формат результата")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков, берётся лучшее время")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора программ")
+    parser.add_argument("--no_memory", action="store_true", help="Не замерять пиковую память")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения", default=None)
+    args = parser.parse_args()
+
+    report = benchmark(args.sizes, args.mixes, args.boundaries, args.backends, args.format, args.repeat, args.seed,
+                       not args.no_memory)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
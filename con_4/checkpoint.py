@@ -0,0 +1,137 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+CHECKPOINT_SUFFIX = ".ckpt"
+CHECKPOINT_MAGIC = b"C4CP\x01"
+DEFAULT_CHECKPOINT_INTERVAL = 1 << 20  # Команд между контрольными точками
+
+# magic, sha256 бинарника, левая и правая границы, ширина значения в байтах, порядок байтов (1 - little)
+CHECKPOINT_HEADER = struct.Struct("=5s32sqqBB")
+# Состояние: количество выполненных команд и номер слота с последним снимком памяти
+CHECKPOINT_STATE = struct.Struct("=QB")
+DATA_OFFSET = 64
+
+
+def encode_cells(registers, width):
+    # Значения ячеек в байтах фиксированной ширины; None, если значение в неё не помещается
+    try:
+        if width == 8:
+            return (registers if isinstance(registers, array) else array('q', registers)).tobytes()
+        return b"".join(value.to_bytes(width, sys.byteorder, signed=True) for value in registers)
+    except OverflowError:
+        return None
+
+
+def decode_cells(data, width):
+    if width == 8:
+        cells = array('q')
+        cells.frombytes(data)
+        return cells
+    return [int.from_bytes(data[i:i + width], sys.byteorder, signed=True) for i in range(0, len(data), width)]
+
+
+def required_width(registers):
+    return max(8, max(((value.bit_length() + 8) // 8 for value in registers), default=8))
+
+
+class Checkpoint:
+    """Контрольные точки исполнения в файле, отображённом в память.
+
+    В файле два слота со снимками памяти: новый снимок пишется в неактивный
+    слот, и только после этого в заголовке обновляются количество выполненных
+    команд и номер слота. Прерванная запись не портит предыдущую точку.
+    Значения хранятся со знаком в фиксированной ширине: 8 байт, пока значения
+    помещаются в int64, иначе файл пересоздаётся с большей шириной.
+    """
+
+    def __init__(self, path, digest, boundaries, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.digest = digest
+        self.boundaries = boundaries
+        self.interval = interval
+        self.size = boundaries[1] - boundaries[0] + 1
+        self.width = 8
+        self.slot = 0
+        self.mapping = None
+
+    def header(self):
+        return CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, self.digest, *self.boundaries, self.width,
+                                      sys.byteorder == "little")
+
+    def slot_offset(self, slot):
+        return DATA_OFFSET + slot * self.size * self.width
+
+    def create(self, registers, pc=0):
+        # Файл создаётся заново с обоими слотами, равными registers; запись атомарна
+        self.close()
+        self.width = required_width(registers)
+        data = encode_cells(registers, self.width)
+        self.slot = 0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=CHECKPOINT_SUFFIX)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(self.header().ljust(DATA_OFFSET - CHECKPOINT_STATE.size, b"\0"))
+                f.write(CHECKPOINT_STATE.pack(pc, self.slot))
+                f.write(data)
+                f.write(data)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.open()
+
+    def open(self):
+        with open(self.path, 'r+b') as f:
+            self.mapping = mmap.mmap(f.fileno(), 0)
+
+    def save(self, registers, pc):
+        data = encode_cells(registers, self.width)
+        if data is None:
+            # Значение не помещается в текущую ширину
+            self.create(registers, pc)
+            return
+        slot = 1 - self.slot
+        start = self.slot_offset(slot)
+        self.mapping[start:start + len(data)] = data
+        self.mapping.flush()
+        CHECKPOINT_STATE.pack_into(self.mapping, DATA_OFFSET - CHECKPOINT_STATE.size, pc, slot)
+        self.mapping.flush()
+        self.slot = slot
+
+    def load(self):
+        # Возвращает (количество выполненных команд, значения ячеек) или None, если точки нет
+        # или она сделана для другого бинарного файла, других границ памяти или порядка байтов
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(DATA_OFFSET)
+                if len(header) != DATA_OFFSET:
+                    return None
+                magic, digest, left, right, width, little = CHECKPOINT_HEADER.unpack_from(header)
+                pc, slot = CHECKPOINT_STATE.unpack_from(header, DATA_OFFSET - CHECKPOINT_STATE.size)
+                if (magic != CHECKPOINT_MAGIC or digest != self.digest or (left, right) != tuple(self.boundaries)
+                        or little != (sys.byteorder == "little") or width < 8 or slot > 1
+                        or os.fstat(f.fileno()).st_size != DATA_OFFSET + 2 * self.size * width):
+                    return None
+                self.width, self.slot = width, slot
+                f.seek(self.slot_offset(slot))
+                data = f.read(self.size * width)
+        except (OSError, struct.error):
+            return None
+        self.open()
+        return pc, decode_cells(data, self.width)
+
+    def close(self):
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    def remove(self):
+        # Исполнение завершено: контрольная точка больше не нужна
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,182 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from interpreter import (LOAD_CONSTANT, READ_MEMORY, WRITE_MEMORY, MUL, WORD_SIZE, FIELD_MASK, CONSTANT_MASK,
+                         ADDRESS_MASK, load_code, program_length)
+
+CHUNK_WORDS = 1 << 18  # Команд в одной порции при потоковой обработке
+
+# Команда как младшие 4 байта и старшие 2 байта, как WORD в interpreter.py
+WORD_DTYPE = np.dtype([("low", "<u4"), ("high", "<u2")])
+
+OPCODES = [LOAD_CONSTANT, READ_MEMORY, WRITE_MEMORY, MUL]
+NAMES = ["LOAD_CONSTANT", "READ_MEMORY", "WRITE_MEMORY", "MUL"]
+NAME_WIDTH = max(len(name) for name in NAMES)
+# Номер команды в OPCODES по коду операции, -1 для неверного кода
+KIND_TABLE = np.full(FIELD_MASK + 1, -1, dtype=np.int8)
+KIND_TABLE[OPCODES] = np.arange(len(OPCODES))
+# Таблицы по номеру команды (последний элемент - для неверного кода): маски полей C и D
+# и маски бит за пределами полей в младших 4 и старших 2 байтах слова
+C_MASKS = np.array([CONSTANT_MASK, ADDRESS_MASK, ADDRESS_MASK, FIELD_MASK, 0], dtype=np.uint32)
+D_MASKS = np.array([0, 0, 0, FIELD_MASK, 0], dtype=np.uint32)
+LOW_EXTRA = np.array([0, ~ADDRESS_MASK << 14, ~ADDRESS_MASK << 14, ~((1 << 28) - 1), 0], dtype=np.int64).astype(np.uint32)
+HIGH_EXTRA = np.array([~((1 << 10) - 1) & 0xFFFF, 0xFFFF, 0xFFFF, 0xFFFF, 0], dtype=np.uint32)
+
+# Ширина колонок строки дизассемблера: A, B, C (константа до 2^28-1), D
+A_WIDTH, B_WIDTH, C_WIDTH, D_WIDTH = 2, 3, 9, 3
+LINE_WIDTH = NAME_WIDTH + 1 + A_WIDTH + 1 + B_WIDTH + 1 + C_WIDTH + 1 + D_WIDTH + 1
+
+
+def iter_words(path, chunk_words=CHUNK_WORDS):
+    # Порции (номер первой команды, массив WORD_DTYPE команд) без завершающих нулевых слов.
+    # Файл читается как отображённый в память массив 6-байтовых слов, неполное
+    # последнее слово дополняется нулями
+    code, mapping = load_code(path)
+    try:
+        length = program_length(code)
+        tail = code[(length - 1) * WORD_SIZE:].tobytes() if length * WORD_SIZE > len(code) else None
+    finally:
+        code.release()
+        if mapping is not None:
+            mapping.close()
+    if length == 0:
+        return
+
+    full = length if tail is None else length - 1
+    words = np.memmap(path, dtype=WORD_DTYPE, mode="r", shape=(full,)) if full else np.empty(0, dtype=WORD_DTYPE)
+    for start in range(0, full, chunk_words):
+        yield start, words[start:start + chunk_words]
+    if tail is not None:
+        yield full, np.frombuffer(tail.ljust(WORD_SIZE, b"\0"), dtype=WORD_DTYPE)
+
+
+def decode_fields(words):
+    # Номер команды в OPCODES (-1 для неверного кода), поля A, B, C, D (uint32) и маска
+    # команд с ненулевыми битами за пределами полей. Все поля, кроме старших бит константы
+    # LOAD_CONSTANT, лежат в младших 4 байтах слова
+    low = np.ascontiguousarray(words["low"])
+    high = words["high"].astype(np.uint32)
+    a = low & FIELD_MASK
+    kind = KIND_TABLE[a]
+    b = (low >> 7) & FIELD_MASK
+    c = ((low >> 14) | (high << 18)) & C_MASKS[kind]
+    d = (low >> 21) & D_MASKS[kind]
+    extra = ((low & LOW_EXTRA[kind]) | (high & HIGH_EXTRA[kind])) != 0
+    return kind, a, b, c, d, extra
+
+
+def verify(path, left_boundary=None, right_boundary=None):
+    # Все нарушения файла списком (номер команды, сообщение) по возрастанию номера.
+    # Границы памяти проверяются, только если заданы
+    violations = []
+    check_bounds = left_boundary is not None and right_boundary is not None
+    for start, words in iter_words(path):
+        kind, a, b, c, d, extra = decode_fields(words)
+        valid = kind >= 0
+        for index in np.flatnonzero(~valid):
+            violations.append((start + int(index), f"неверный код операции {int(a[index])}"))
+
+        for index in np.flatnonzero(valid & extra):
+            violations.append((start + int(index), "ненулевые биты за пределами полей команды"))
+
+        if check_bounds:
+            for name, values, used in (("B", b, valid), ("C", c, valid & (kind != 0)), ("D", d, kind == 3)):
+                outside = used & ((values < left_boundary) | (values > right_boundary))
+                for index in np.flatnonzero(outside):
+                    violations.append((start + int(index),
+                                       f"адрес {name} = {int(values[index])} вне диапазона "
+                                       f"[{left_boundary}, {right_boundary}]"))
+    violations.sort(key=lambda violation: violation[0])
+    return violations
+
+
+# Цифры всех чисел от 0 до 999: числа переводятся в текст группами по три цифры
+DIGIT_GROUPS = np.array([list(f"{value:03d}".encode()) for value in range(1000)], dtype=np.uint8)
+POWERS_OF_TEN = 10 ** np.arange(C_WIDTH, dtype=np.uint32)
+NAME_TABLE = np.array([list(name.ljust(NAME_WIDTH).encode()) for name in NAMES], dtype=np.uint8)
+NAME_KEEP = np.array([[i < len(name) for i in range(NAME_WIDTH)] for name in NAMES])
+
+
+def write_number(rows, keep, position, values, width):
+    # Записывает числа в колонку rows[:, position:position + width] с ведущими нулями
+    # и снимает в keep отметки с ведущих нулей (кроме последней цифры)
+    end = position + width
+    rest = values
+    while end > position:
+        start = max(position, end - 3)
+        rows[:, start:end] = DIGIT_GROUPS[rest % 1000][:, 3 - (end - start):]
+        rest = rest // 1000
+        end = start
+    keep[:, position:position + width] = values[:, None] >= POWERS_OF_TEN[width - 1::-1]
+    keep[:, position + width - 1] = True
+
+
+def disassemble_chunk(words):
+    # Текст команд в синтаксисе Assembler. Строки собираются в матрице фиксированной
+    # ширины, затем лишние позиции (ведущие нули, пробелы выравнивания) отбрасываются маской
+    kind, a, b, c, d, _ = decode_fields(words)
+    rows = np.full((len(words), LINE_WIDTH), ord(" "), dtype=np.uint8)
+    keep = np.ones((len(words), LINE_WIDTH), dtype=bool)
+
+    rows[:, :NAME_WIDTH] = NAME_TABLE[kind]
+    keep[:, :NAME_WIDTH] = NAME_KEEP[kind]
+    position = NAME_WIDTH
+    for values, width in ((a, A_WIDTH), (b, B_WIDTH), (c, C_WIDTH), (d, D_WIDTH)):
+        position += 1  # Пробел перед числом
+        write_number(rows, keep, position, values, width)
+        position += width
+    rows[:, position] = ord("\n")
+
+    # У команд кроме MUL нет поля D: убираются и пробел перед ним, и его цифры
+    keep[kind != 3, LINE_WIDTH - D_WIDTH - 2:LINE_WIDTH - 1] = False
+    return rows[keep].tobytes()
+
+
+def disassemble(path, out):
+    # Пишет текст программы в поток out (бинарный). Перед дизассемблированием файл
+    # проверяется: неверные команды нельзя записать в синтаксисе Assembler
+    violations = verify(path)
+    if violations:
+        raise ValueError(format_violations(violations))
+    for _, words in iter_words(path):
+        out.write(disassemble_chunk(words))
+
+
+def format_violations(violations):
+    return "\n".join(f"Команда {index} (смещение {index * WORD_SIZE}): {message}" for index, message in violations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка и дизассемблирование бинарных файлов программ")
+    commands = parser.add_subparsers(dest="command", required=True)
+    verify_parser = commands.add_parser("verify", help="Проверить коды операций и адреса всех команд")
+    verify_parser.add_argument("input", help="Входной бинарный файл")
+    verify_parser.add_argument("-lb", "--left_boundary", help="Левая граница памяти", type=int, default=0)
+    verify_parser.add_argument("-rb", "--right_boundary", help="Правая граница памяти", type=int, default=8191)
+    disasm_parser = commands.add_parser("disasm", help="Записать программу в синтаксисе ассемблера")
+    disasm_parser.add_argument("input", help="Входной бинарный файл")
+    disasm_parser.add_argument("output", help="Выходной файл (.asm), - для вывода в stdout")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        violations = verify(args.input, args.left_boundary, args.right_boundary)
+        if violations:
+            print(format_violations(violations))
+            print(f"Нарушений: {len(violations)}")
+            sys.exit(1)
+        print("Нарушений не найдено")
+    else:
+        try:
+            if args.output == "-":
+                disassemble(args.input, sys.stdout.buffer)
+            else:
+                with open(args.output, "wb") as output:
+                    disassemble(args.input, output)
+        except ValueError as e:
+            if args.output != "-" and os.path.exists(args.output):
+                os.remove(args.output)
+            print(e)
+            sys.exit(1)
@@ -1,122 +1,419 @@
 import argparse
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import chain, count
+
+from checkpoint import CHECKPOINT_SUFFIX, DEFAULT_CHECKPOINT_INTERVAL, Checkpoint
+from memory import MEMORY_KINDS, create_memory, touched_cells
+from results import RESULT_FORMATS, write_result
+
+WORD_SIZE = 6  # Размер одной команды в байтах
+WORD = struct.Struct("<IH")  # Команда как младшие 4 байта и старшие 2 байта
+FIELD_MASK = (1 << 7) - 1
+CONSTANT_MASK = (1 << 28) - 1
+ADDRESS_MASK = (1 << 13) - 1
+
+LOAD_CONSTANT = 36
+READ_MEMORY = 58
+WRITE_MEMORY = 25
+MUL = 32
+
+INVALID_OPCODE_MESSAGE = "В бинарном файле содержатся невалидные данные: неверный байт-код"
+INVALID_ADDRESS_MESSAGE = \
+    "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона"
+
+CACHE_SUFFIX = ".pdc"
+CACHE_MAGIC = b"C4PD\x01"
+CACHE_HEADER = struct.Struct("<5s32sQqqq")  # magic, sha256 бинарника, длина, invalid, min/max адреса
+
+
+def load_code(path_to_binary_file):
+    # Отображает бинарный файл в память; возвращает (memoryview, объект mmap или None)
+    with open(path_to_binary_file, 'rb') as binary_file:
+        try:
+            mapping = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Пустой файл нельзя отобразить в память
+            return memoryview(b""), None
+    return memoryview(mapping), mapping
+
+
+def binary_digest(path_to_binary_file):
+    # sha256 содержимого бинарного файла: ключ кэшей и контрольных точек
+    code, mapping = load_code(path_to_binary_file)
+    try:
+        return hashlib.sha256(code).digest()
+    finally:
+        code.release()
+        if mapping is not None:
+            mapping.close()
+
+
+def fetch(code, pc):
+    # Команда с номером pc как целое число; неполная последняя команда дополняется нулями
+    offset = pc * WORD_SIZE
+    if offset + WORD_SIZE <= len(code):
+        low, high = WORD.unpack_from(code, offset)
+        return low | (high << 32)
+    return int.from_bytes(code[offset:], byteorder="little")
+
+
+def program_length(code):
+    # Количество команд без завершающих нулевых слов (их интерпретатор не исполняет)
+    length = -(-len(code) // WORD_SIZE)
+    while length > 0 and fetch(code, length - 1) == 0:
+        length -= 1
+    return length
+
+
+class Program:
+    """Предекодированная программа: параллельные массивы opcode, B, C, D.
+
+    Массивы не зависят от границ памяти, поэтому один раз декодированную
+    программу можно исполнять с разными границами и сохранять на диск.
+    Декодирование останавливается на первом неверном коде операции, его номер
+    хранится в invalid.
+    """
+
+    def __init__(self, opcodes, b, c, d, invalid=None, address_bounds=None):
+        self.opcodes = opcodes
+        self.b = b
+        self.c = c
+        self.d = d
+        self.invalid = invalid
+        self._written = None
+        if address_bounds is None:
+            address_bounds = self.find_address_bounds()
+        self.address_min, self.address_max = address_bounds
+
+    def find_address_bounds(self):
+        # Адресами являются B всех команд, C всех команд, кроме LOAD_CONSTANT, и D команды MUL
+        c_addresses = [value for op, value in zip(self.opcodes, self.c) if op != LOAD_CONSTANT]
+        d_addresses = [value for op, value in zip(self.opcodes, self.d) if op == MUL]
+        parts = [part for part in (self.b, c_addresses, d_addresses) if part]
+        if not parts:
+            return None, None
+        return min(min(part) for part in parts), max(max(part) for part in parts)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    @classmethod
+    def decode(cls, code):
+        opcodes, b, c, d = array('I'), array('I'), array('I'), array('I')
+        append_op, append_b, append_c, append_d = opcodes.append, b.append, c.append, d.append
+        invalid = None
+
+        length = program_length(code)
+        full = min(length, len(code) // WORD_SIZE)
+        words = (low | (high << 32) for low, high in WORD.iter_unpack(code[:full * WORD_SIZE]))
+        if length > full:
+            words = chain(words, [fetch(code, full)])
+
+        for index, word in enumerate(words):
+            a = word & FIELD_MASK
+            if a == LOAD_CONSTANT:
+                append_c((word >> 14) & CONSTANT_MASK)
+                append_d(0)
+            elif a == READ_MEMORY or a == WRITE_MEMORY:
+                append_c((word >> 14) & ADDRESS_MASK)
+                append_d(0)
+            elif a == MUL:
+                append_c((word >> 14) & FIELD_MASK)
+                append_d((word >> 21) & FIELD_MASK)
+            else:
+                invalid = index
+                break
+            append_op(a)
+            append_b((word >> 7) & FIELD_MASK)
+        return cls(opcodes, b, c, d, invalid)
+
+    @classmethod
+    def from_file(cls, path_to_binary_file, cache=False):
+        # При cache=True предекодированная форма хранится рядом с бинарником в файле .pdc
+        code, mapping = load_code(path_to_binary_file)
+        try:
+            if not cache:
+                return cls.decode(code)
+            digest = hashlib.sha256(code).digest()
+            cache_path = path_to_binary_file + CACHE_SUFFIX
+            program = cls.load(cache_path, digest)
+            if program is None:
+                program = cls.decode(code)
+                program.save(cache_path, digest)
+            return program
+        finally:
+            code.release()
+            if mapping is not None:
+                mapping.close()
+
+    def save(self, path, digest):
+        header = CACHE_HEADER.pack(CACHE_MAGIC, digest, len(self),
+                                   -1 if self.invalid is None else self.invalid,
+                                   -1 if self.address_min is None else self.address_min,
+                                   -1 if self.address_max is None else self.address_max)
+        # Атомарная запись: прерванное сохранение не оставляет недописанного кэша
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=CACHE_SUFFIX)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(header)
+                for values in (self.opcodes, self.b, self.c, self.d):
+                    f.write(as_little_endian(values).tobytes())
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    @classmethod
+    def load(cls, path, digest):
+        # Возвращает None, если кэша нет, он построен для другого бинарного файла
+        # или его размер не совпадает с длиной из заголовка
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(CACHE_HEADER.size)
+                if len(header) != CACHE_HEADER.size:
+                    return None
+                magic, cached_digest, length, invalid, address_min, address_max = CACHE_HEADER.unpack(header)
+                if magic != CACHE_MAGIC or cached_digest != digest:
+                    return None
+                fields = []
+                for _ in range(4):
+                    values = array('I')
+                    data = f.read(length * values.itemsize)
+                    if len(data) != length * values.itemsize:
+                        return None
+                    values.frombytes(data)
+                    fields.append(as_little_endian(values))
+                if f.read(1):
+                    return None
+        except (OSError, ValueError):
+            return None
+
+        return cls(*fields,
+                   invalid=None if invalid < 0 else invalid,
+                   address_bounds=(None, None) if address_min < 0 else (address_min, address_max))
+
+    def validate(self, left_boundary, right_boundary):
+        # Все проверки выполняются до исполнения. Ошибка адреса в командах перед
+        # неверным кодом операции сообщается первой, как при последовательном исполнении
+        if self.address_min is not None and not (
+                left_boundary <= self.address_min and self.address_max <= right_boundary):
+            raise ValueError(INVALID_ADDRESS_MESSAGE)
+        if self.invalid is not None:
+            raise ValueError(INVALID_OPCODE_MESSAGE)
+
+    def valid_prefix(self, left_boundary, right_boundary):
+        # Количество команд до первой команды с адресом вне диапазона. Декодирование
+        # останавливается на неверном коде операции, так что он префикс тоже ограничивает
+        inside = range(left_boundary, right_boundary + 1)
+        for index, (op, B, C, D) in enumerate(zip(self.opcodes, self.b, self.c, self.d)):
+            if B not in inside or (op != LOAD_CONSTANT and C not in inside) or (op == MUL and D not in inside):
+                return index
+        return len(self)
+
+    def prefix(self, length):
+        return Program(self.opcodes[:length], self.b[:length], self.c[:length], self.d[:length])
+
+    def written_addresses(self):
+        # Адреса ячеек, в которые пишет программа, по возрастанию
+        if self._written is None:
+            written = {B for op, B in zip(self.opcodes, self.b) if op != WRITE_MEMORY}
+            written.update(C for op, C in zip(self.opcodes, self.c) if op == WRITE_MEMORY)
+            self._written = sorted(written)
+        return self._written
+
+    def rebased(self, offset):
+        # Массивы B, C, D с адресами, отсчитанными от левой границы памяти
+        if offset == 0:
+            return self.b, self.c, self.d
+        b = array('I', [value - offset for value in self.b])
+        c = array('I', [value if op == LOAD_CONSTANT else value - offset for op, value in zip(self.opcodes, self.c)])
+        d = array('I', [value - offset if op == MUL else 0 for op, value in zip(self.opcodes, self.d)])
+        return b, c, d
+
+
+def as_little_endian(values):
+    # Массивы кэша хранятся в порядке байтов little-endian независимо от платформы
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
 
 class Interpreter:
-    def __init__(self, path_to_binary_file, left_boundary, right_boundary, path_to_result_file):
+    def __init__(self, path_to_binary_file, left_boundary, right_boundary, path_to_result_file, cache=False,
+                 backend="python", memory="auto", result_format="xml", profile=None, checkpoint_path=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, resume=False):
+        self.binary_path = path_to_binary_file
         self.result_path = path_to_result_file
+        self.result_format = result_format
+        self.backend = backend
+        self.cache = cache
         self.boundaries = (left_boundary, right_boundary)
-        self.registers = [0] * (right_boundary - left_boundary + 1)
+        size = right_boundary - left_boundary + 1
+        if backend == "numpy":
+            if memory == "sparse":
+                raise ValueError("Исполнение через NumPy требует плотной памяти")
+            if memory == "auto":
+                memory = "list"
+        if profile is not None and backend != "python":
+            raise ValueError("Профилирование поддерживается только при последовательном исполнении")
+        # profile - объект profiler.Profile; без него используется цикл без инструментирования
+        self.profile = profile
 
-        with open(path_to_binary_file, 'rb') as binary_file:
-            self.byte_code = int.from_bytes(binary_file.read(), byteorder="little")
+        self.checkpoint = None
+        if checkpoint_path is not None:
+            if backend != "python" or profile is not None or memory == "sparse":
+                raise ValueError("Контрольные точки поддерживаются только при последовательном исполнении "
+                                 "без профилирования и с плотной памятью")
+            if memory == "auto":
+                memory = "list"
+            self.checkpoint = Checkpoint(checkpoint_path, binary_digest(path_to_binary_file), self.boundaries,
+                                         checkpoint_interval)
+        self.registers = create_memory(memory, size)
 
-    def interpret(self):
-        while self.byte_code != 0:
-            a = self.byte_code & ((1 << 7) - 1)
-            self.byte_code >>= 7
-            match a:
-                case 36:
-                    self.load_constant()
-                case 58:
-                    self.read_memory()
-                case 25:
-                    self.write_memory()
-                case 32:
-                    self.mul()
-                case _:
-                    raise ValueError("В бинарном файле содержатся невалидные данные: неверный байт-код")
+        self.program = Program.from_file(path_to_binary_file, cache)
+        # Количество выполненных команд; при продолжении берётся из контрольной точки
+        self.pc = 0
+        self.resumed = False
+        if self.checkpoint is not None:
+            # Новый файл контрольной точки создаётся в run(), после проверки программы
+            state = self.checkpoint.load() if resume else None
+            if state is not None:
+                self.pc, values = state
+                self.registers = list(values) if isinstance(self.registers, list) else values
+                self.resumed = True
 
+    def interpret(self):
+        try:
+            self.program.validate(*self.boundaries)
+        except ValueError:
+            if self.profile is not None:
+                self.trace_valid_prefix()
+            raise
+        self.run(self.pc)
         self.make_result()
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
 
-    def load_constant(self):
-        B = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 7
-        C = self.byte_code & ((1 << 28) - 1)
-        self.byte_code >>= 34
-
-        if not (self.boundaries[0] <= B <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-
-        self.registers[B] = C
-
-    def read_memory(self):
-        B = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 7
-        C = self.byte_code & ((1 << 13) - 1)
-        self.byte_code >>= 34
-
-        if not (self.boundaries[0] <= B <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-        if not (self.boundaries[0] <= C <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-
-        self.registers[B] = self.registers[C]
-
-    def write_memory(self):
-        B = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 7
-        C = self.byte_code & ((1 << 13) - 1)
-        self.byte_code >>= 34
-
-        if not (self.boundaries[0] <= B <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-        if not (self.boundaries[0] <= C <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-
-        self.registers[C] = self.registers[B]
-
-    def mul(self):
-        B = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 7
-        C = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 7
-        D = self.byte_code & ((1 << 7) - 1)
-        self.byte_code >>= 27
-
-        if not (self.boundaries[0] <= B <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-        if not (self.boundaries[0] <= C <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-        if not (self.boundaries[0] <= D <= self.boundaries[1]):
-            raise ValueError(
-                "В бинарном файле присутствуют невалидные данные: обращение к ячейки памяти по адресу вне диапазона")
-
-        self.registers[B] = self.registers[C] * self.registers[D]
+    def trace_valid_prefix(self):
+        # Программа не прошла проверку: при профилировании команды до первой неверной
+        # исполняются, чтобы статистика и трасса показывали, что ей предшествовало
+        from profiler import run_profiled
+        prefix = self.program.prefix(self.program.valid_prefix(*self.boundaries))
+        self.registers = run_profiled(prefix, self.registers, self.boundaries[0], self.profile)
+        self.pc = len(prefix)
+        self.profile.dump_trace()
 
-    def make_result(self):
-        result_root = ET.Element("result")
-        for pos, register in enumerate(self.registers, self.boundaries[0]):
-            if (register != 0):
-                element = ET.SubElement(result_root, "register")
-                element.attrib['address'] = str(pos)
-                element.text = str(register)
+    def run(self, start=0):
+        if self.backend == "numpy":
+            # NumPy - необязательная зависимость, модуль импортируется только здесь
+            from numpy_backend import run_vectorized
+            self.registers = run_vectorized(self.program, self.registers, self.boundaries[0])
+            self.pc = len(self.program)
+            return
+        if self.backend == "compiled":
+            # Программа транслируется в функцию Python без цикла диспетчеризации
+            from translator import load_function, run_compiled
+            function = load_function(self.binary_path, self.program, self.cache)
+            self.registers = run_compiled(function, self.program, self.registers, self.boundaries[0])
+            self.pc = len(self.program)
+            return
+        if self.profile is not None:
+            from profiler import run_profiled
+            self.registers = run_profiled(self.program, self.registers, self.boundaries[0], self.profile)
+            self.pc = len(self.program)
+            return
 
-        log_data = ET.tostring(result_root, encoding="unicode", method="xml").encode()
-        dom = xml.dom.minidom.parseString(log_data)
-        log = f'<?xml version="1.0" encoding="utf-8"?>\n' + dom.toprettyxml(newl="\n")[23:]
-        with open(self.result_path, 'w', encoding='utf-8') as f:
-            f.write(log)
+        # Цикл диспетчеризации по предекодированным массивам; проверки границ уже выполнены.
+        # С контрольными точками программа исполняется отрезками по checkpoint.interval команд
+        registers = self.registers
+        opcodes = self.program.opcodes
+        b, c, d = self.program.rebased(self.boundaries[0])
+        length = len(self.program)
+        step = self.checkpoint.interval if self.checkpoint is not None else length
+        if self.checkpoint is not None and self.checkpoint.mapping is None:
+            self.checkpoint.create(registers, start)
+        pc = start
+        while pc < length:
+            stop = min(pc + step, length)
+            while True:
+                try:
+                    for pc, op, B, C, D in zip(count(pc), opcodes[pc:stop], b[pc:stop], c[pc:stop], d[pc:stop]):
+                        if op == LOAD_CONSTANT:
+                            registers[B] = C
+                        elif op == MUL:
+                            registers[B] = registers[C] * registers[D]
+                        elif op == READ_MEMORY:
+                            registers[B] = registers[C]
+                        else:
+                            registers[C] = registers[B]
+                    break
+                except OverflowError:
+                    # Значение не помещается в array('q'): память переводится в список int Python,
+                    # команда pc не была выполнена и исполняется повторно
+                    self.registers = registers = list(registers)
+            pc = stop
+            if self.checkpoint is not None:
+                self.checkpoint.save(registers, pc)
+        self.pc = length
+
+    def make_result(self):
+        offset = self.boundaries[0]
+        written = [address - offset for address in self.program.written_addresses()]
+        cells = ((index + offset, value) for index, value in touched_cells(self.registers, written))
+        write_result(self.result_path, cells, self.result_format, offset)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input", help="Входной бинарный файл")
-    parser.add_argument("output", help="Выходной XML файл")
+    parser.add_argument("output", help="Выходной файл результата")
     parser.add_argument("-lb", "--left_boundary", help="Левая граница памяти", default=0)
     parser.add_argument("-rb", "--right_boundary", help="Правая граница памяти", default=8191)
+    parser.add_argument("--cache", action="store_true",
+                        help="Кэшировать предекодированную (и для compiled - скомпилированную) программу рядом с бинарным файлом")
+    parser.add_argument("--backend", choices=["python", "numpy", "compiled"], default="python",
+                        help="Способ исполнения: python - последовательно, numpy - уровнями независимых команд, "
+                             "compiled - трансляцией в функцию Python")
+    parser.add_argument("--memory", choices=MEMORY_KINDS, default="auto",
+                        help="Представление памяти: list, array (array('q')), sparse (словарь) или auto")
+    parser.add_argument("-f", "--format", choices=RESULT_FORMATS, default="xml",
+                        help="Формат результата: xml, binary (дамп little-endian с заголовком), csv или jsonl")
+    parser.add_argument("--profile", action="store_true",
+                        help="Собрать статистику по кодам операций и тепловую карту обращений к памяти")
+    parser.add_argument("--bucket_size", type=int, default=64, help="Ширина диапазона адресов в тепловой карте")
+    parser.add_argument("--trace", type=int, default=0,
+                        help="Хранить последние N команд и вывести их при ошибке исполнения или проверки программы")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help=f"Периодически сохранять состояние исполнения в файл <output>{CHECKPOINT_SUFFIX}")
+    parser.add_argument("--checkpoint_interval", type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help="Количество команд между контрольными точками")
+    parser.add_argument("--resume", action="store_true",
+                        help="Продолжить исполнение с последней контрольной точки (включает --checkpoint)")
     args = parser.parse_args()
 
-    interpreter = Interpreter(args.input, int(args.left_boundary), int(args.right_boundary), args.output)
+    profile = None
+    if args.profile or args.trace:
+        from profiler import Profile
+        profile = Profile(args.bucket_size, args.trace)
+    checkpoint_path = args.output + CHECKPOINT_SUFFIX if args.checkpoint or args.resume else None
+    interpreter = Interpreter(args.input, int(args.left_boundary), int(args.right_boundary), args.output, args.cache,
+                              args.backend, args.memory, args.format, profile, checkpoint_path,
+                              args.checkpoint_interval, args.resume)
+    if args.resume:
+        if interpreter.resumed:
+            print(f"Исполнение продолжено с команды {interpreter.pc}")
+        else:
+            print("Контрольная точка не найдена, исполнение начинается сначала")
     try:
         interpreter.interpret()
     except ValueError as e:
         print(e)
+    if args.profile:
+        profile.report()
     print(f"Интерпретация выполнена успешно. Результаты сохранены в {args.output}")
@@ -0,0 +1,42 @@
+from array import array
+
+MEMORY_KINDS = ("auto", "list", "array", "sparse")
+
+# При автоматическом выборе диапазоны больше этого числа ячеек хранятся разреженно
+AUTO_SPARSE_CELLS = 1 << 16
+
+
+class SparseMemory(dict):
+    """Разреженная память: хранятся только ячейки, в которые была запись.
+
+    Чтение ячейки без записи возвращает 0, поэтому объект подставляется
+    вместо списка регистров без изменений в цикле интерпретатора.
+    """
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+
+    def __missing__(self, index):
+        return 0
+
+
+def create_memory(kind, size):
+    # list - список int Python, array - плотный массив array('q') 64-битных значений,
+    # sparse - SparseMemory, auto - sparse для широких диапазонов, иначе list
+    if kind == "auto":
+        kind = "sparse" if size > AUTO_SPARSE_CELLS else "list"
+    if kind == "list":
+        return [0] * size
+    if kind == "array":
+        return array('q', bytes(8 * size))
+    if kind == "sparse":
+        return SparseMemory(size)
+    raise ValueError(f"Неизвестный вид памяти: {kind}")
+
+
+def touched_cells(registers, written_indices):
+    # Номера ячеек (от левой границы) с ненулевыми значениями по возрастанию.
+    # Для плотной памяти просматриваются только ячейки, в которые пишет программа
+    indices = sorted(registers) if isinstance(registers, SparseMemory) else written_indices
+    return ((index, registers[index]) for index in indices if registers[index] != 0)
@@ -0,0 +1,122 @@
+import numpy as np
+
+from interpreter import LOAD_CONSTANT, WRITE_MEMORY, MUL
+
+# Порог |x * y|, после которого умножение в int64 считается небезопасным. Оценка
+# идёт в float64, поэтому порог взят с запасом; дальше вычисления идут в int Python
+OVERFLOW_LIMIT = 2.0 ** 62
+
+CONSTANT, COPY, PRODUCT = 0, 1, 2
+
+
+def build_levels(kind, dest, x, y):
+    # Уровень команды на 1 больше уровня последней записи в любую читаемую ячейку
+    # и в записываемую ячейку, и не меньше уровня последнего чтения записываемой
+    # ячейки: внутри уровня все чтения выполняются до всех записей
+    last_write = {}
+    last_read = {}
+    levels = []
+    for k, w, r1, r2 in zip(kind, dest, x, y):
+        level = last_write.get(w, -1) + 1
+        level = max(level, last_read.get(w, 0))
+        if k != CONSTANT:
+            level = max(level, last_write.get(r1, -1) + 1)
+            if k == PRODUCT:
+                level = max(level, last_write.get(r2, -1) + 1)
+            last_read[r1] = max(last_read.get(r1, 0), level)
+            if k == PRODUCT:
+                last_read[r2] = max(last_read.get(r2, 0), level)
+        last_write[w] = level
+        levels.append(level)
+    return levels
+
+
+class Schedule:
+    """Программа, разбитая на уровни независимых команд.
+
+    Каждая команда приводится к виду dest = константа, dest = [x] или
+    dest = [x] * [y]; команды одного уровня исполняются пакетными операциями
+    NumPy. Расписание зависит от левой границы памяти, но не от её содержимого,
+    поэтому его можно строить один раз и исполнять многократно.
+    """
+
+    def __init__(self, program, offset=0):
+        b, c, d = program.rebased(offset)
+        opcodes = np.frombuffer(program.opcodes, dtype=np.uint32)
+        b = np.frombuffer(b, dtype=np.uint32).astype(np.intp)
+        c = np.frombuffer(c, dtype=np.uint32).astype(np.intp)
+        d = np.frombuffer(d, dtype=np.uint32).astype(np.intp)
+
+        is_write = opcodes == WRITE_MEMORY
+        kind = np.where(opcodes == LOAD_CONSTANT, CONSTANT, np.where(opcodes == MUL, PRODUCT, COPY))
+        dest = np.where(is_write, c, b)
+        x = np.where(is_write, b, c)
+        y = d
+
+        levels = np.array(build_levels(kind.tolist(), dest.tolist(), x.tolist(), y.tolist()), dtype=np.intp)
+        self.level_count = int(levels.max()) + 1 if len(levels) else 0
+
+        order = np.lexsort((kind, levels))
+        kind, dest, x, y = kind[order], dest[order], x[order], y[order]
+        keys = levels[order] * 3 + kind
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        ends = np.append(starts[1:], len(keys))
+
+        # Шаги: для каждого уровня (константы, копирования, умножения)
+        self.steps = [[None, None, None] for _ in range(self.level_count)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            level, k = divmod(int(keys[start]), 3)
+            part = slice(start, end)
+            if k == CONSTANT:
+                self.steps[level][k] = (dest[part], x[part].astype(np.int64))
+            elif k == COPY:
+                self.steps[level][k] = (dest[part], x[part])
+            else:
+                self.steps[level][k] = (dest[part], x[part], y[part])
+
+    def execute(self, registers):
+        # registers: одномерный массив ячеек или двумерный (строка на каждый набор памяти).
+        # Возвращает массив результата: при угрозе переполнения int64 он заменяется на dtype=object
+        for constants, copies, products in self.steps:
+            copied = registers[..., copies[1]] if copies is not None else None
+            multiplied = None
+            if products is not None:
+                left = registers[..., products[1]]
+                right = registers[..., products[2]]
+                if registers.dtype != object and np.any(
+                        np.abs(left.astype(np.float64) * right.astype(np.float64)) >= OVERFLOW_LIMIT):
+                    registers = registers.astype(object)
+                    left, right = left.astype(object), right.astype(object)
+                multiplied = left * right
+
+            if constants is not None:
+                registers[..., constants[0]] = constants[1]
+            if copied is not None:
+                registers[..., copies[0]] = copied
+            if multiplied is not None:
+                registers[..., products[0]] = multiplied
+        return registers
+
+
+def run_vectorized(program, registers, offset=0, schedule=None):
+    # Исполняет программу над списком регистров и возвращает новый список значений
+    if schedule is None:
+        schedule = Schedule(program, offset)
+    try:
+        memory = np.array(registers, dtype=np.int64)
+    except OverflowError:
+        memory = np.array(registers, dtype=object)
+    return schedule.execute(memory).tolist()
+
+
+def run_batch(program, memories, offset=0, schedule=None):
+    # Исполняет одну программу над каждой строкой двумерной матрицы памяти
+    # (строка - один набор начальных значений ячеек). Матрица не изменяется
+    if schedule is None:
+        schedule = Schedule(program, offset)
+    memories = np.asarray(memories)
+    if memories.dtype == object:
+        memory = memories.copy()
+    else:
+        memory = memories.astype(np.int64)
+    return schedule.execute(memory)
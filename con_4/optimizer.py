@@ -0,0 +1,204 @@
+import argparse
+from collections import namedtuple
+
+from interpreter import (Program, LOAD_CONSTANT, READ_MEMORY, WRITE_MEMORY, MUL, WORD_SIZE,
+                         INVALID_OPCODE_MESSAGE)
+
+CONSTANT_LIMIT = 1 << 28  # Константа LOAD_CONSTANT занимает 28 бит
+SHORT_ADDRESS_LIMIT = 1 << 7  # B всех команд и C, D команды MUL занимают 7 бит
+
+UNKNOWN = object()  # Значение ячейки не известно во время оптимизации
+
+# Отчёт: длина до и после, удалённые мёртвые записи, свёрнутые MUL, замены копий константами,
+# удалённые записи значения, которое уже есть в ячейке
+Report = namedtuple("Report", ["original", "optimized", "dead_stores", "folded", "constant_copies", "redundant"])
+
+
+def instructions(program):
+    return list(zip(program.opcodes, program.b, program.c, program.d))
+
+
+def encode(instruction):
+    op, b, c, d = instruction
+    return (op | (b << 7) | (c << 14) | (d << 21)).to_bytes(WORD_SIZE, byteorder="little")
+
+
+def destination(instruction):
+    op, b, c, d = instruction
+    return c if op == WRITE_MEMORY else b
+
+
+def sources(instruction):
+    op, b, c, d = instruction
+    if op == LOAD_CONSTANT:
+        return ()
+    if op == READ_MEMORY:
+        return (c,)
+    if op == WRITE_MEMORY:
+        return (b,)
+    return (c, d)
+
+
+class ForwardPass:
+    """Прямой проход: распространение констант и копий и свёртка MUL.
+
+    values хранит известные значения ячеек, copy_of - ячейку-источник, значение
+    которой совпадает со значением ячейки. При zero_memory начальные значения
+    всех ячеек считаются нулевыми, иначе неизвестными.
+    """
+
+    def __init__(self, zero_memory):
+        self.initial = 0 if zero_memory else UNKNOWN
+        self.values = {}
+        self.copy_of = {}
+        self.copies = {}  # Обратное отображение: источник -> ячейки-копии
+        self.folded = self.constant_copies = self.redundant = 0
+
+    def value(self, cell):
+        return self.values.get(cell, self.initial)
+
+    def root(self, cell):
+        return self.copy_of.get(cell, cell)
+
+    def assign(self, cell, value, source=None):
+        # Запись в ячейку: её прежние копии перестают совпадать с ней
+        for copy in self.copies.pop(cell, ()):
+            del self.copy_of[copy]
+        old_source = self.copy_of.pop(cell, None)
+        if old_source is not None:
+            self.copies[old_source].discard(cell)
+        self.values[cell] = value
+        if source is not None and source != cell:
+            self.copy_of[cell] = source
+            self.copies.setdefault(source, set()).add(cell)
+
+    def load(self, cell, value, output):
+        if self.value(cell) == value:
+            self.redundant += 1
+            return
+        output.append((LOAD_CONSTANT, cell, value, 0))
+        self.assign(cell, value)
+
+    def copy(self, cell, source, original, output):
+        # cell = [source]; original - исходная команда, если её нельзя переписать
+        source_root = self.root(source)
+        value = self.value(source)
+        if source_root == cell or self.root(cell) == source_root or (
+                value is not UNKNOWN and self.value(cell) == value):
+            self.redundant += 1
+            return
+        if value is not UNKNOWN and value < CONSTANT_LIMIT and cell < SHORT_ADDRESS_LIMIT:
+            self.constant_copies += 1
+            self.load(cell, value, output)
+            return
+        if cell < SHORT_ADDRESS_LIMIT:
+            output.append((READ_MEMORY, cell, source_root, 0))
+        elif source_root < SHORT_ADDRESS_LIMIT:
+            output.append((WRITE_MEMORY, source_root, cell, 0))
+        else:
+            output.append(original)
+            source_root = source
+        self.assign(cell, value, source_root)
+
+    def run(self, program):
+        output = []
+        for instruction in program:
+            op, b, c, d = instruction
+            if op == LOAD_CONSTANT:
+                self.load(b, c, output)
+            elif op == READ_MEMORY:
+                self.copy(b, c, instruction, output)
+            elif op == WRITE_MEMORY:
+                self.copy(c, b, instruction, output)
+            else:
+                self.mul(b, c, d, output)
+        return output
+
+    def mul(self, cell, left, right, output):
+        left_value, right_value = self.value(left), self.value(right)
+        if left_value is not UNKNOWN and right_value is not UNKNOWN:
+            product = left_value * right_value
+            if product < CONSTANT_LIMIT:
+                self.folded += 1
+                self.load(cell, product, output)
+                return
+        elif left_value == 0 or right_value == 0:
+            self.folded += 1
+            self.load(cell, 0, output)
+            return
+        elif left_value == 1 or right_value == 1:
+            self.folded += 1
+            source = right if left_value == 1 else left
+            self.copy(cell, source, (READ_MEMORY, cell, source, 0), output)
+            return
+        else:
+            product = UNKNOWN
+
+        # Операнды заменяются исходными ячейками копий, если те помещаются в 7 бит
+        left_root, right_root = self.root(left), self.root(right)
+        left = left_root if left_root < SHORT_ADDRESS_LIMIT else left
+        right = right_root if right_root < SHORT_ADDRESS_LIMIT else right
+        output.append((MUL, cell, left, right))
+        self.assign(cell, product)
+
+
+def eliminate_dead_stores(program):
+    # Обратный проход: запись мёртвая, если ячейка перезаписывается раньше, чем читается.
+    # В конце программы живы все ячейки, так как итоговое состояние памяти сохраняется
+    overwritten = set()
+    kept = []
+    for instruction in reversed(program):
+        cell = destination(instruction)
+        if cell in overwritten:
+            continue
+        overwritten.add(cell)
+        overwritten.difference_update(sources(instruction))
+        kept.append(instruction)
+    kept.reverse()
+    return kept
+
+
+def optimize(program, zero_memory=False):
+    # Возвращает (список команд, Report). Проходы повторяются, пока программа сокращается
+    if program.invalid is not None:
+        raise ValueError(INVALID_OPCODE_MESSAGE)
+    current = instructions(program)
+    dead_stores = folded = constant_copies = redundant = 0
+    while True:
+        forward = ForwardPass(zero_memory)
+        optimized = forward.run(current)
+        folded += forward.folded
+        constant_copies += forward.constant_copies
+        redundant += forward.redundant
+        kept = eliminate_dead_stores(optimized)
+        dead_stores += len(optimized) - len(kept)
+        done = len(kept) == len(current)  # Без сокращения длины повторный проход ничего не даст
+        current = kept
+        if done:
+            break
+    return current, Report(len(program), len(current), dead_stores, folded, constant_copies, redundant)
+
+
+def write_program(path, program):
+    with open(path, "wb") as binary:
+        binary.write(b"".join(encode(instruction) for instruction in program))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оптимизация бинарного файла программы")
+    parser.add_argument("input", help="Входной бинарный файл")
+    parser.add_argument("output", help="Выходной бинарный файл")
+    parser.add_argument("--zero_memory", action="store_true",
+                        help="Считать начальные значения всех ячеек нулевыми (как в interpreter.py)")
+    args = parser.parse_args()
+
+    try:
+        optimized, report = optimize(Program.from_file(args.input), args.zero_memory)
+    except ValueError as e:
+        print(e)
+    else:
+        write_program(args.output, optimized)
+        print(f"Команд до оптимизации: {report.original}, после: {report.optimized} "
+              f"(удалено {report.original - report.optimized})")
+        print(f"Мёртвых записей: {report.dead_stores}, свёрнутых MUL: {report.folded}, "
+              f"копий заменено константами: {report.constant_copies}, лишних записей: {report.redundant}")
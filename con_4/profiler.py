@@ -0,0 +1,98 @@
+import sys
+from collections import Counter, deque
+from itertools import count
+from time import perf_counter_ns
+
+from interpreter import LOAD_CONSTANT, READ_MEMORY, WRITE_MEMORY, MUL
+
+OPCODE_NAMES = {LOAD_CONSTANT: "LOAD_CONSTANT", READ_MEMORY: "READ_MEMORY", WRITE_MEMORY: "WRITE_MEMORY", MUL: "MUL"}
+DEFAULT_BUCKET_SIZE = 64  # Ширина диапазона адресов в тепловой карте обращений к памяти
+
+
+class Profile:
+    """Статистика исполнения программы.
+
+    counts и times - количество и суммарное время (нс) команд по кодам операций,
+    reads и writes - обращения к памяти по диапазонам адресов ширины bucket_size
+    (ключ - номер диапазона). При trace_length > 0 в trace хранятся последние
+    trace_length исполненных команд в виде (pc, opcode, B, C, D).
+    """
+
+    def __init__(self, bucket_size=DEFAULT_BUCKET_SIZE, trace_length=0):
+        self.bucket_size = bucket_size
+        self.counts = Counter()
+        self.times = Counter()
+        self.reads = Counter()
+        self.writes = Counter()
+        self.trace = deque(maxlen=trace_length) if trace_length > 0 else None
+
+    def heatmap(self):
+        # Список (первый адрес, последний адрес, чтений, записей) по возрастанию адресов
+        buckets = sorted(self.reads.keys() | self.writes.keys())
+        return [(bucket * self.bucket_size, (bucket + 1) * self.bucket_size - 1, self.reads[bucket], self.writes[bucket])
+                for bucket in buckets]
+
+    def report(self, out=None):
+        out = out or sys.stdout
+        out.write(f"{'Команда':<16}{'Количество':>12}{'Время, мс':>12}\n")
+        for op, executed in self.counts.most_common():
+            out.write(f"{OPCODE_NAMES[op]:<16}{executed:>12}{self.times[op] / 1e6:>12.3f}\n")
+        out.write(f"{'Адреса':<16}{'Чтений':>12}{'Записей':>12}\n")
+        for first, last, reads, writes in self.heatmap():
+            out.write(f"{f'{first}-{last}':<16}{reads:>12}{writes:>12}\n")
+
+    def dump_trace(self, out=None):
+        out = out or sys.stderr
+        if not self.trace:
+            return
+        out.write(f"Последние исполненные команды ({len(self.trace)}):\n")
+        for pc, op, B, C, D in self.trace:
+            args = (B, C, D) if op == MUL else (B, C)
+            out.write(f"{pc}: {OPCODE_NAMES[op]} {' '.join(map(str, args))}\n")
+
+
+def run_profiled(program, registers, offset, profile):
+    # Вариант цикла диспетчеризации со сбором статистики в profile. Адреса в статистике
+    # и трассе абсолютные. Возвращает память (список, если array('q') переполнился).
+    # При ошибке во время исполнения трасса выводится в stderr
+    opcodes = program.opcodes
+    b, c, d = program.rebased(offset)
+    counts, times = profile.counts, profile.times
+    reads, writes = profile.reads, profile.writes
+    trace = profile.trace
+    bucket_size = profile.bucket_size
+    pc = 0
+    try:
+        while True:
+            try:
+                for pc, op, B, C, D in zip(count(pc), opcodes[pc:], b[pc:], c[pc:], d[pc:]):
+                    started = perf_counter_ns()
+                    if op == LOAD_CONSTANT:
+                        registers[B] = C
+                        written = B
+                    elif op == MUL:
+                        registers[B] = registers[C] * registers[D]
+                        written = B
+                        reads[(C + offset) // bucket_size] += 1
+                        reads[(D + offset) // bucket_size] += 1
+                    elif op == READ_MEMORY:
+                        registers[B] = registers[C]
+                        written = B
+                        reads[(C + offset) // bucket_size] += 1
+                    else:
+                        registers[C] = registers[B]
+                        written = C
+                        reads[(B + offset) // bucket_size] += 1
+                    times[op] += perf_counter_ns() - started
+                    counts[op] += 1
+                    writes[(written + offset) // bucket_size] += 1
+                    if trace is not None:
+                        trace.append((pc, op, program.b[pc], program.c[pc], program.d[pc]))
+                break
+            except OverflowError:
+                # Как в основном цикле: команда pc не выполнена и исполняется повторно
+                registers = list(registers)
+    except BaseException:
+        profile.dump_trace()
+        raise
+    return registers
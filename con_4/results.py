@@ -0,0 +1,84 @@
+import json
+import struct
+import sys
+from array import array
+
+RESULT_FORMATS = ("xml", "binary", "csv", "jsonl")
+
+BINARY_MAGIC = b"C4RS"
+# magic, ширина значения в байтах, адрес первой ячейки, количество ячеек
+BINARY_HEADER = struct.Struct("<4sBqQ")
+
+
+def write_xml(f, cells):
+    # Потоковая запись: каждая ячейка выводится сразу, без построения дерева в памяти
+    f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+    empty = True
+    for address, value in cells:
+        if empty:
+            f.write("<result>\n")
+            empty = False
+        f.write(f'\t<register address="{address}">{value}</register>\n')
+    f.write("<result/>\n" if empty else "</result>\n")
+
+
+def write_csv(f, cells):
+    f.write("address,value\n")
+    for address, value in cells:
+        f.write(f"{address},{value}\n")
+
+
+def write_jsonl(f, cells):
+    for address, value in cells:
+        f.write(json.dumps({"address": address, "value": value}) + "\n")
+
+
+def write_binary(f, cells, left_boundary):
+    # Сплошной дамп ячеек от левой границы до последней ненулевой в little-endian.
+    # Значения знаковые; ширина 8 байт, если все значения помещаются в int64, иначе больше
+    cells = list(cells)
+    count = cells[-1][0] - left_boundary + 1 if cells else 0
+    bits = max((value.bit_length() for _, value in cells), default=0) + 1
+    width = max(8, -(-bits // 8))
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, width, left_boundary, count))
+    if width == 8:
+        values = array('q', bytes(8 * count))
+        for address, value in cells:
+            values[address - left_boundary] = value
+        if sys.byteorder == "big":
+            values.byteswap()
+        f.write(values.tobytes())
+        return
+    dump = bytearray(width * count)
+    for address, value in cells:
+        offset = (address - left_boundary) * width
+        dump[offset:offset + width] = value.to_bytes(width, byteorder="little", signed=True)
+    f.write(dump)
+
+
+def read_binary(path):
+    # Обратное чтение дампа: (адрес первой ячейки, список значений)
+    with open(path, 'rb') as f:
+        magic, width, left_boundary, count = BINARY_HEADER.unpack(f.read(BINARY_HEADER.size))
+        if magic != BINARY_MAGIC:
+            raise ValueError("Файл не является бинарным дампом результата")
+        data = f.read(width * count)
+    return left_boundary, [int.from_bytes(data[i:i + width], byteorder="little", signed=True)
+                           for i in range(0, len(data), width)]
+
+
+def write_result(path, cells, result_format="xml", left_boundary=0):
+    # cells - итератор пар (адрес, значение) ненулевых ячеек по возрастанию адреса
+    if result_format == "binary":
+        with open(path, 'wb') as f:
+            write_binary(f, cells, left_boundary)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        if result_format == "xml":
+            write_xml(f, cells)
+        elif result_format == "csv":
+            write_csv(f, cells)
+        elif result_format == "jsonl":
+            write_jsonl(f, cells)
+        else:
+            raise ValueError(f"Неизвестный формат результата: {result_format}")
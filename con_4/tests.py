@@ -1,7 +1,32 @@
 import unittest
+import contextlib
+import hashlib
+import io
 import os
+import random
 from assembler import Assembler
-from interpreter import Interpreter
+from interpreter import Interpreter, Program, CACHE_SUFFIX
+from results import read_binary
+
+def random_program(seed, length=300, address_range=8, wide_range=None, small_constants=False):
+    # Байты случайной программы из команд четырёх видов. B, C, D берутся из [0, address_range),
+    # адреса C команд READ_MEMORY и WRITE_MEMORY - из [0, wide_range), если он задан.
+    # При small_constants константы с вероятностью 2/3 равны 0 или 1
+    generator = random.Random(seed)
+    words = []
+    for _ in range(length):
+        B, C, D = (generator.randrange(address_range) for _ in range(3))
+        constant = generator.randrange(1 << 28)
+        if small_constants:
+            constant = generator.choice([0, 1, constant])
+        read, write = (generator.randrange(wide_range) for _ in range(2)) if wide_range else (C, C)
+        words.append(generator.choice([
+            (constant << 14) | (B << 7) | 36,
+            (read << 14) | (B << 7) | 58,
+            (write << 14) | (B << 7) | 25,
+            (D << 21) | (C << 14) | (B << 7) | 32,
+        ]).to_bytes(6, byteorder="little"))
+    return b"".join(words)
 
 class TestAssembler(unittest.TestCase):
     def test_load_const(self):
@@ -100,6 +125,75 @@ class TestAssembler(unittest.TestCase):
 
         os.remove(filename)
 
+    def test_program_and_log(self):
+        filename = 'test_file.asm'
+        binary_file = 'test_bin.bin'
+        log_file = 'test_log.xml'
+
+        with open(filename, 'w') as f:
+            f.write("LOAD_CONSTANT 36 32 12\n\nMUL 32 68 90 15\n")
+
+        assembler = Assembler(filename, binary_file, log_file)
+        assembler.assemble()
+        with open(binary_file, 'rb') as f:
+            binary = f.read()
+        with open(log_file, encoding='utf-8') as f:
+            log = f.read()
+
+        assembler_without_log = Assembler(filename, binary_file, None)
+        assembler_without_log.assemble()
+
+        os.remove(filename)
+        os.remove(binary_file)
+        os.remove(log_file)
+
+        self.assertEqual(binary.hex(), "241003000000" "20a2f6010000")
+        self.assertEqual(len(assembler.bytes), 2)
+        self.assertEqual(log, '<?xml version="1.0" encoding="utf-8"?>\n'
+                              '<log>\n'
+                              '\t<LOAD_CONSTANT A="36" B="32" C="12">241003000000</LOAD_CONSTANT>\n'
+                              '\t<MUL A="32" B="68" C="90" D="15">20a2f6010000</MUL>\n'
+                              '</log>\n')
+        self.assertIsNone(assembler_without_log.log_lines)
+
+    def test_parallel(self):
+        filename = 'test_file.asm'
+        binary_file = 'test_bin.bin'
+        parallel_file = 'test_bin_parallel.bin'
+        log_file = 'test_log.xml'
+        parallel_log_file = 'test_log_parallel.xml'
+
+        with open('program.asm') as f:
+            source = f.read() + "\n"
+        with open(filename, 'w') as f:
+            f.write(source * 20)
+
+        Assembler(filename, binary_file, log_file).assemble()
+        Assembler(filename, parallel_file, parallel_log_file).assemble(jobs=2, chunk_size=100)
+        with open(binary_file, 'rb') as f:
+            expected = f.read()
+        with open(parallel_file, 'rb') as f:
+            parallel = f.read()
+        with open(log_file, encoding='utf-8') as f:
+            expected_log = f.read()
+        with open(parallel_log_file, encoding='utf-8') as f:
+            parallel_log = f.read()
+
+        with open(filename, 'a') as f:
+            f.write("MOV 50\n")
+        for jobs in (2, 1):
+            with self.assertRaisesRegex(SyntaxError, "Строка 261: MOV 50\nНеизвестная команда"):
+                Assembler(filename, parallel_file, None).assemble(jobs=jobs, chunk_size=100)
+
+        os.remove(filename)
+        os.remove(binary_file)
+        os.remove(log_file)
+        os.remove(parallel_log_file)
+
+        self.assertEqual(parallel, expected)
+        self.assertEqual(parallel_log, expected_log)
+        self.assertFalse(os.path.exists(parallel_file))
+
 class TestInterpreter(unittest.TestCase):
     def test_load_const(self):
         filename = 'test_file.bin'
@@ -176,5 +270,474 @@ class TestInterpreter(unittest.TestCase):
 
         self.assertEqual(interpreter.registers[919], 0)
 
+    def test_program(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        # LOAD_CONSTANT 36 0 3; LOAD_CONSTANT 36 1 5; MUL 32 2 0 1; WRITE_MEMORY 25 2 100, затем нулевое слово
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\xc0\x00\x00\x00\x00" b"\xa4\x40\x01\x00\x00\x00"
+                    b"\x20\x01\x20\x00\x00\x00" b"\x19\x01\x19\x00\x00\x00" + bytes(6))
+
+        interpreter = Interpreter(filename, 0, 9181, result_file)
+        interpreter.interpret()
+
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertEqual(interpreter.registers[2], 15)
+        self.assertEqual(interpreter.registers[100], 15)
+
+    def test_left_boundary(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\x10\x03\x00\x00\x00")
+
+        interpreter = Interpreter(filename, 30, 40, result_file)
+        interpreter.interpret()
+
+        with open(result_file, encoding='utf-8') as f:
+            result = f.read()
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertIn('<register address="32">12</register>', result)
+
+    def test_address_error_before_execution(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        # LOAD_CONSTANT 36 32 12, затем MUL с адресом D = 90 вне диапазона [0, 50]
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\x10\x03\x00\x00\x00" b"\x20\xa2\xf6\x01\x00\x00")
+
+        interpreter = Interpreter(filename, 0, 50, result_file)
+        with self.assertRaisesRegex(ValueError, "обращение к ячейки памяти по адресу вне диапазона"):
+            interpreter.interpret()
+
+        os.remove(filename)
+
+        self.assertEqual(interpreter.registers[32], 0)
+
+    def test_program_cache(self):
+        filename = 'test_file.bin'
+
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\x10\x03\x00\x00\x00" b"\x20\xa2\xf6\x01\x00\x00" b"\x01\x00\x00\x00\x00\x00")
+
+        decoded = Program.from_file(filename)
+        cached = Program.from_file(filename, cache=True)
+        loaded = Program.from_file(filename, cache=True)
+
+        # Обрезанный кэш с верным заголовком не загружается и пересоздаётся
+        with open(filename + CACHE_SUFFIX, 'r+b') as f:
+            f.truncate(os.path.getsize(filename + CACHE_SUFFIX) - 4)
+        with open(filename, 'rb') as f:
+            digest = hashlib.sha256(f.read()).digest()
+        self.assertIsNone(Program.load(filename + CACHE_SUFFIX, digest))
+        rebuilt = Program.from_file(filename, cache=True)
+
+        os.remove(filename)
+        os.remove(filename + CACHE_SUFFIX)
+
+        for program in (cached, loaded, rebuilt):
+            self.assertEqual(list(program.opcodes), [36, 32])
+            self.assertEqual(list(program.b), list(decoded.b))
+            self.assertEqual(list(program.c), list(decoded.c))
+            self.assertEqual(list(program.d), list(decoded.d))
+            self.assertEqual(program.invalid, 2)
+            self.assertEqual((program.address_min, program.address_max), (15, 90))
+
+    def test_memory_kinds(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        # LOAD_CONSTANT 36 0 2^27; MUL 32 1 0 0 (дважды, значение выходит за пределы int64); WRITE_MEMORY 25 1 8000
+        with open(filename, 'wb') as f:
+            f.write(((1 << 27 << 14) | 36).to_bytes(6, byteorder="little")
+                    + ((1 << 7) | 32).to_bytes(6, byteorder="little")
+                    + ((1 << 21) | (1 << 14) | (1 << 7) | 32).to_bytes(6, byteorder="little")
+                    + ((8000 << 14) | (1 << 7) | 25).to_bytes(6, byteorder="little"))
+
+        results = {}
+        for memory in ("list", "array", "sparse"):
+            interpreter = Interpreter(filename, 0, 10 ** 9, result_file, memory=memory) if memory == "sparse" \
+                else Interpreter(filename, 0, 9181, result_file, memory=memory)
+            interpreter.interpret()
+            with open(result_file, encoding='utf-8') as f:
+                results[memory] = f.read()
+            self.assertEqual(interpreter.registers[8000], 1 << 108)
+
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertEqual(results["array"], results["list"])
+        self.assertEqual(results["sparse"], results["list"])
+
+    def test_result_formats(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result'
+
+        # LOAD_CONSTANT 36 2 2^27; MUL 32 3 2 2; MUL 32 5 3 3 (2^108)
+        with open(filename, 'wb') as f:
+            f.write(((1 << 27 << 14) | (2 << 7) | 36).to_bytes(6, byteorder="little")
+                    + ((2 << 21) | (2 << 14) | (3 << 7) | 32).to_bytes(6, byteorder="little")
+                    + ((3 << 21) | (3 << 14) | (5 << 7) | 32).to_bytes(6, byteorder="little"))
+
+        outputs = {}
+        for result_format in ("xml", "csv", "jsonl", "binary"):
+            interpreter = Interpreter(filename, 1, 9181, result_file, result_format=result_format)
+            interpreter.interpret()
+            if result_format == "binary":
+                outputs[result_format] = read_binary(result_file)
+            else:
+                with open(result_file, encoding='utf-8') as f:
+                    outputs[result_format] = f.read()
+
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertIn('\t<register address="5">324518553658426726783156020576256</register>\n', outputs["xml"])
+        self.assertEqual(outputs["csv"], "address,value\n2,134217728\n3,18014398509481984\n5,324518553658426726783156020576256\n")
+        self.assertEqual(outputs["jsonl"].splitlines()[0], '{"address": 2, "value": 134217728}')
+        self.assertEqual(outputs["binary"], (1, [0, 1 << 27, 1 << 54, 0, 1 << 108]))
+
+    def test_profile(self):
+        from profiler import Profile
+
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        # LOAD_CONSTANT 36 0 3; LOAD_CONSTANT 36 1 5; MUL 32 2 0 1; WRITE_MEMORY 25 2 100
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\xc0\x00\x00\x00\x00" b"\xa4\x40\x01\x00\x00\x00"
+                    b"\x20\x01\x20\x00\x00\x00" b"\x19\x01\x19\x00\x00\x00")
+
+        profile = Profile(bucket_size=64, trace_length=2)
+        interpreter = Interpreter(filename, 0, 9181, result_file, profile=profile)
+        interpreter.interpret()
+
+        self.assertEqual(interpreter.registers[100], 15)
+        self.assertEqual(dict(profile.counts), {36: 2, 32: 1, 25: 1})
+        self.assertEqual(profile.heatmap(), [(0, 63, 3, 3), (64, 127, 0, 1)])
+        self.assertEqual(list(profile.trace), [(2, 32, 2, 0, 1), (3, 25, 2, 100, 0)])
+
+        # Ошибка во время исполнения: трасса последних команд выводится в stderr
+        profile = Profile(trace_length=2)
+        interpreter = Interpreter(filename, 0, 9181, result_file, profile=profile)
+        interpreter.registers = [0] * 3
+        stderr = io.StringIO()
+        with self.assertRaises(IndexError), contextlib.redirect_stderr(stderr):
+            interpreter.run()
+
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertEqual(stderr.getvalue(), "Последние исполненные команды (2):\n1: LOAD_CONSTANT 1 5\n2: MUL 2 0 1\n")
+
+        # Программа не проходит проверку (WRITE_MEMORY по адресу 100 вне [0, 50], затем неверный
+        # код операции): исполняются команды до неверной, и их трасса выводится в stderr
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\xc0\x00\x00\x00\x00" b"\xa4\x40\x01\x00\x00\x00"
+                    b"\x20\x01\x20\x00\x00\x00" b"\x19\x01\x19\x00\x00\x00" b"\x01\x00\x00\x00\x00\x00")
+        for right_boundary, executed in ((50, 3), (9181, 4)):
+            profile = Profile(trace_length=2)
+            interpreter = Interpreter(filename, 0, right_boundary, result_file, profile=profile)
+            stderr = io.StringIO()
+            with self.assertRaises(ValueError), contextlib.redirect_stderr(stderr):
+                interpreter.interpret()
+            self.assertEqual(sum(profile.counts.values()), executed)
+            self.assertEqual(stderr.getvalue().splitlines()[-1],
+                             "2: MUL 2 0 1" if executed == 3 else "3: WRITE_MEMORY 2 100")
+        os.remove(filename)
+
+    def test_compiled_backend(self):
+        from translator import COMPILED_SUFFIX
+
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        with open(filename, 'wb') as f:
+            f.write(random_program(2))
+
+        expected = Interpreter(filename, 0, 100, result_file)
+        expected.interpret()
+        results = []
+        # Первый запуск компилирует программу и сохраняет кэш, второй загружает его
+        for memory in ("list", "array"):
+            compiled = Interpreter(filename, 0, 100, result_file, cache=True, backend="compiled", memory=memory)
+            compiled.interpret()
+            results.append(list(compiled.registers))
+        cached = os.path.exists(filename + COMPILED_SUFFIX)
+
+        os.remove(filename)
+        os.remove(filename + CACHE_SUFFIX)
+        os.remove(filename + COMPILED_SUFFIX)
+        os.remove(result_file)
+
+        self.assertTrue(cached)
+        self.assertEqual(results, [expected.registers, expected.registers])
+
+    def test_checkpoint_resume(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+        checkpoint_file = 'test_result.ckpt'
+
+        with open(filename, 'wb') as f:
+            f.write(random_program(3))
+
+        expected = Interpreter(filename, 0, 100, result_file)
+        expected.interpret()
+
+        for memory, interrupted_at in (("list", 100), ("array", 250)):
+            interpreter = Interpreter(filename, 0, 100, result_file, memory=memory,
+                                      checkpoint_path=checkpoint_file, checkpoint_interval=50)
+            save = interpreter.checkpoint.save
+
+            # Исполнение прерывается сразу после сохранения контрольной точки
+            def interrupting_save(registers, pc):
+                save(registers, pc)
+                if pc == interrupted_at:
+                    raise KeyboardInterrupt
+            interpreter.checkpoint.save = interrupting_save
+            with self.assertRaises(KeyboardInterrupt):
+                interpreter.interpret()
+            interpreter.checkpoint.close()
+
+            resumed = Interpreter(filename, 0, 100, result_file, memory=memory,
+                                  checkpoint_path=checkpoint_file, checkpoint_interval=50, resume=True)
+            self.assertTrue(resumed.resumed)
+            self.assertEqual(resumed.pc, interrupted_at)
+            resumed.interpret()
+            self.assertEqual(list(resumed.registers), expected.registers)
+            self.assertFalse(os.path.exists(checkpoint_file))
+
+        # Программа не проходит проверку: файл контрольной точки не создаётся
+        interpreter = Interpreter(filename, 0, 5, result_file, checkpoint_path=checkpoint_file)
+        with self.assertRaises(ValueError):
+            interpreter.interpret()
+        self.assertFalse(os.path.exists(checkpoint_file))
+
+        os.remove(filename)
+        os.remove(result_file)
+
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy не установлен")
+
+    def test_matches_python_backend(self):
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        with open(filename, 'wb') as f:
+            f.write(random_program(0))
+
+        expected = Interpreter(filename, 0, 100, result_file)
+        expected.interpret()
+        vectorized = Interpreter(filename, 0, 100, result_file, backend="numpy")
+        vectorized.interpret()
+
+        os.remove(filename)
+        os.remove(result_file)
+
+        self.assertEqual(vectorized.registers, expected.registers)
+        # Значения вырастают за пределы int64 и досчитываются в int Python
+        self.assertTrue(any(register >= 1 << 63 for register in expected.registers))
+
+    def test_batch(self):
+        from numpy_backend import run_batch
+
+        filename = 'test_file.bin'
+        result_file = 'test_result.xml'
+
+        # READ_MEMORY 58 2 0; MUL 32 3 0 1; WRITE_MEMORY 25 3 4; LOAD_CONSTANT 36 0 7
+        with open(filename, 'wb') as f:
+            f.write(((0 << 14) | (2 << 7) | 58).to_bytes(6, byteorder="little")
+                    + ((1 << 21) | (0 << 14) | (3 << 7) | 32).to_bytes(6, byteorder="little")
+                    + ((4 << 14) | (3 << 7) | 25).to_bytes(6, byteorder="little")
+                    + ((7 << 14) | (0 << 7) | 36).to_bytes(6, byteorder="little"))
+
+        memories = [[2, 3, 0, 0, 0, 9], [-5, 4, 1, 1, 1, 0], [1 << 40, 1 << 40, 0, 0, 0, 0]]
+        interpreter = Interpreter(filename, 0, 5, result_file)
+        results = run_batch(interpreter.program, memories)
+
+        expected = []
+        for memory in memories:
+            interpreter.registers = list(memory)
+            interpreter.run()
+            expected.append(interpreter.registers)
+
+        os.remove(filename)
+
+        self.assertEqual(results.tolist(), expected)
+        self.assertEqual(expected[0], [7, 3, 2, 6, 6, 9])
+
+    def test_save_results_without_pickle(self):
+        import numpy as np
+        from numpy_backend import run_batch
+        from batch_interpreter import save_results, load_results
+
+        filename = 'test_file.bin'
+        output_file = 'test_results.npz'
+        with open(filename, 'wb') as f:
+            f.write(random_program(5))
+        program = Program.from_file(filename)
+        os.remove(filename)
+
+        # Промежуточные произведения переводят матрицу в dtype=object, хотя итоговые значения
+        # помещаются в int64; во второй матрице есть значение шире int64
+        results = run_batch(program, np.zeros((2, 8), dtype=np.int64))
+        self.assertEqual(results.dtype, object)
+        wide = np.array([[1 << 70, 0, 5], [-(1 << 70), 0, 0]], dtype=object)
+        for matrix, stored in ((results, "values"), (wide, "wide_values")):
+            save_results(output_file, matrix, 10)
+            with np.load(output_file) as data:
+                self.assertEqual(sorted(data.files), ["addresses", stored])
+                for name in data.files:
+                    self.assertNotEqual(data[name].dtype, object)
+            addresses, values = load_results(output_file)
+            os.remove(output_file)
+            columns = addresses - 10
+            self.assertEqual(values.tolist(), matrix[:, columns].tolist())
+        self.assertEqual(columns.tolist(), [0, 2])
+
+    def test_load_memories_pickle_opt_in(self):
+        import numpy as np
+        from batch_interpreter import load_memories
+
+        filename = 'test_memories.npy'
+        np.save(filename, np.array([[1 << 70, 2]], dtype=object), allow_pickle=True)
+        with self.assertRaisesRegex(ValueError, "--allow_pickle"):
+            load_memories(filename, 4)
+        memories = load_memories(filename, 4, allow_pickle=True)
+        np.save(filename, np.array([[3, 4]], dtype=np.int64))
+        plain = load_memories(filename, 4)
+        os.remove(filename)
+
+        self.assertEqual(memories.tolist(), [[1 << 70, 2, 0, 0]])
+        self.assertEqual(plain.tolist(), [[3, 4, 0, 0]])
+
+class TestOptimizer(unittest.TestCase):
+    def test_equivalent_and_shorter(self):
+        from optimizer import optimize, write_program
+
+        filename = 'test_file.bin'
+        optimized_file = 'test_optimized.bin'
+        result_file = 'test_result.xml'
+
+        with open(filename, 'wb') as f:
+            f.write(random_program(1, small_constants=True))
+
+        program = Program.from_file(filename)
+        generator = random.Random(1)
+        for zero_memory in (False, True):
+            optimized, report = optimize(program, zero_memory)
+            write_program(optimized_file, optimized)
+            self.assertEqual(report.original - report.optimized, len(program) - len(optimized))
+            self.assertLess(len(optimized), len(program))
+
+            memories = [[0] * 8] if zero_memory else [[0] * 8, [generator.randrange(-9, 10) for _ in range(8)]]
+            for memory in memories:
+                expected = Interpreter(filename, 0, 7, result_file)
+                expected.registers = list(memory)
+                expected.run()
+                actual = Interpreter(optimized_file, 0, 7, result_file)
+                actual.registers = list(memory)
+                actual.run()
+                self.assertEqual(actual.registers, expected.registers)
+
+        os.remove(filename)
+        os.remove(optimized_file)
+
+    def test_folding(self):
+        from optimizer import optimize
+
+        filename = 'test_file.bin'
+
+        # LOAD_CONSTANT 36 0 3; LOAD_CONSTANT 36 1 5; MUL 32 2 0 1; LOAD_CONSTANT 36 0 1; MUL 32 3 4 0
+        with open(filename, 'wb') as f:
+            f.write(b"\x24\xc0\x00\x00\x00\x00" b"\xa4\x40\x01\x00\x00\x00" b"\x20\x01\x20\x00\x00\x00"
+                    + ((1 << 14) | 36).to_bytes(6, byteorder="little")
+                    + ((4 << 14) | (3 << 7) | 32).to_bytes(6, byteorder="little"))
+
+        optimized, report = optimize(Program.from_file(filename))
+        os.remove(filename)
+
+        # Первая запись в ячейку 0 мёртвая, MUL на 1 становится копированием
+        self.assertEqual(optimized, [(36, 1, 5, 0), (36, 2, 15, 0), (36, 0, 1, 0), (58, 3, 4, 0)])
+        self.assertEqual((report.dead_stores, report.folded), (1, 2))
+
+class TestDisassembler(unittest.TestCase):
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy не установлен")
+
+    def test_round_trip(self):
+        from disasm import disassemble
+
+        filename = 'test_file.bin'
+        source_file = 'test_file.asm'
+        binary_file = 'test_bin.bin'
+
+        program = random_program(4, length=500, address_range=128, wide_range=1 << 13)
+        with open(filename, 'wb') as f:
+            f.write(program)
+        with open(source_file, 'wb') as f:
+            disassemble(filename, f)
+
+        Assembler(source_file, binary_file, None).assemble()
+        with open(source_file, encoding='utf-8') as f:
+            first_line = f.readline()
+        with open(binary_file, 'rb') as f:
+            assembled = f.read()
+
+        os.remove(filename)
+        os.remove(source_file)
+        os.remove(binary_file)
+
+        self.assertEqual(assembled, program)
+        self.assertRegex(first_line, r"^(LOAD_CONSTANT 36|READ_MEMORY 58|WRITE_MEMORY 25|MUL 32)( \d+)+\n$")
+
+    def test_verify_reports_all_violations(self):
+        from disasm import verify
+
+        filename = 'test_file.bin'
+
+        # Неверный код 5; READ_MEMORY с адресом C = 808 вне диапазона; LOAD_CONSTANT с битом 45;
+        # неполная последняя команда MUL 32 2 0 0
+        with open(filename, 'wb') as f:
+            f.write((5).to_bytes(6, byteorder="little")
+                    + ((808 << 14) | (3 << 7) | 58).to_bytes(6, byteorder="little")
+                    + ((1 << 45) | 36).to_bytes(6, byteorder="little")
+                    + b"\x20\x01\x00")
+
+        violations = verify(filename, 0, 100)
+        os.remove(filename)
+
+        self.assertEqual(violations, [
+            (0, "неверный код операции 5"),
+            (1, "адрес C = 808 вне диапазона [0, 100]"),
+            (2, "ненулевые биты за пределами полей команды"),
+        ])
+
+class TestBenchmark(unittest.TestCase):
+    def test_all_mixes(self):
+        from benchmark import MIXES, PHASES, benchmark, compare
+
+        report = benchmark([200], sorted(MIXES), [127, 8191], repeat=1)
+
+        self.assertEqual(len(report["records"]), 2 * len(MIXES))
+        for record in report["records"]:
+            self.assertEqual(sorted(record["seconds"]), sorted(PHASES))
+            self.assertGreater(record["peak_bytes"]["decode"], 0)
+        self.assertEqual(len(compare(report, report)), len(report["records"]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+import marshal
+import struct
+from importlib.util import MAGIC_NUMBER
+
+from interpreter import LOAD_CONSTANT, READ_MEMORY, MUL, binary_digest
+
+COMPILED_SUFFIX = ".aot"
+COMPILED_MAGIC = b"C4AO\x01"
+COMPILED_HEADER = struct.Struct("<5s4s32s")  # magic, версия байт-кода Python, sha256 бинарника
+FUNCTION_NAME = "program"
+
+
+def translate(program):
+    # Исходный текст функции program(registers, offset). Ячейки памяти становятся локальными
+    # переменными r<адрес>: ячейки, читаемые до первой записи, загружаются в начале, функция
+    # возвращает кортеж значений ячеек в порядке program.written_addresses()
+    loaded = set()
+    written = set()
+
+    def read(address):
+        if address not in written:
+            loaded.add(address)
+        return f"r{address}"
+
+    body = []
+    for op, B, C, D in zip(program.opcodes, program.b, program.c, program.d):
+        if op == LOAD_CONSTANT:
+            body.append(f"    r{B} = {C}\n")
+            written.add(B)
+        elif op == MUL:
+            body.append(f"    r{B} = {read(C)} * {read(D)}\n")
+            written.add(B)
+        elif op == READ_MEMORY:
+            body.append(f"    r{B} = {read(C)}\n")
+            written.add(B)
+        else:
+            body.append(f"    r{C} = {read(B)}\n")
+            written.add(C)
+
+    prologue = [f"    r{address} = registers[{address} - offset]\n" for address in sorted(loaded)]
+    results = ", ".join(f"r{address}" for address in program.written_addresses())
+    epilogue = f"    return ({results}{',' if results else ''})\n"
+    return f"def {FUNCTION_NAME}(registers, offset):\n" + "".join(prologue) + "".join(body) + epilogue
+
+
+def compile_program(program, filename="<program>"):
+    return compile(translate(program), filename, "exec")
+
+
+def save_compiled(path, digest, module_code):
+    with open(path, 'wb') as f:
+        f.write(COMPILED_HEADER.pack(COMPILED_MAGIC, MAGIC_NUMBER, digest))
+        marshal.dump(module_code, f)
+
+
+def load_compiled(path, digest):
+    # Возвращает None, если кэша нет, он построен для другого бинарного файла
+    # или другой версии Python (формат marshal от неё зависит)
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(COMPILED_HEADER.size)
+            if len(header) != COMPILED_HEADER.size:
+                return None
+            magic, python_magic, cached_digest = COMPILED_HEADER.unpack(header)
+            if magic != COMPILED_MAGIC or python_magic != MAGIC_NUMBER or cached_digest != digest:
+                return None
+            return marshal.load(f)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+
+def load_function(path_to_binary_file, program, cache=False):
+    # Функция программы; при cache=True скомпилированный код хранится рядом с бинарником в файле .aot.
+    # program должна быть проверена Program.validate: трансляция не проверяет коды операций
+    if not cache:
+        module_code = compile_program(program, path_to_binary_file)
+    else:
+        digest = binary_digest(path_to_binary_file)
+        cache_path = path_to_binary_file + COMPILED_SUFFIX
+        module_code = load_compiled(cache_path, digest)
+        if module_code is None:
+            module_code = compile_program(program, path_to_binary_file)
+            save_compiled(cache_path, digest, module_code)
+
+    namespace = {}
+    exec(module_code, namespace)
+    return namespace[FUNCTION_NAME]
+
+
+def run_compiled(function, program, registers, offset):
+    # Исполняет функцию программы и записывает результаты в память.
+    # Возвращает память (список, если значение не поместилось в array('q'))
+    values = function(registers, offset)
+    written = [address - offset for address in program.written_addresses()]
+    try:
+        for index, value in zip(written, values):
+            registers[index] = value
+    except OverflowError:
+        # Запись результатов можно повторить целиком: функция память не изменяет
+        registers = list(registers)
+        for index, value in zip(written, values):
+            registers[index] = value
+    return registers